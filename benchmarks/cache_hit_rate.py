@@ -0,0 +1,93 @@
+"""
+Cache hit rate vs worker count for each cache backend.
+
+A fixed stream of requests (Zipf-like popularity over a set of cities) is
+spread round-robin across N worker processes, the way a load balancer would.
+Every cache miss stands for an upstream call (OpenWeather / Gemini).
+
+Run from the repository root:
+
+    python benchmarks/cache_hit_rate.py
+
+The redis backend is exercised against the in-process RESP stand-in from
+tests/resp_stand_in.py, so no Redis server is needed.
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache import RedisBackend, SQLiteBackend, TieredCache
+from tests.resp_stand_in import RespStandIn
+
+CITIES = 200
+REQUESTS = 4000
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+def make_backend(kind, target):
+    if kind == "sqlite":
+        return SQLiteBackend(target)
+    if kind == "redis":
+        return RedisBackend(target)
+    return None
+
+
+def worker(kind, target, namespace, keys, results):
+    cache = TieredCache(namespace, maxsize=1024, ttl=600, backend=make_backend(kind, target))
+    upstream_calls = 0
+    for key in keys:
+        if cache.get(key) is None:
+            upstream_calls += 1
+            cache.set(key, {"city": key, "forecast": [20.0] * 8})
+    results.put(upstream_calls)
+
+
+def run(kind, target, workers, stream):
+    namespace = f"bench-{kind}-{workers}-{time.time_ns()}"
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(kind, target, namespace, stream[i::workers], results))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    upstream_calls = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return 1 - upstream_calls / len(stream), upstream_calls
+
+
+def main():
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(CITIES)]
+    stream = [f"city-{i}" for i in rng.choices(range(CITIES), weights=weights, k=REQUESTS)]
+
+    server = RespStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    redis_url = f"redis://127.0.0.1:{server.server_address[1]}/0"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        targets = {
+            "memory": None,
+            "sqlite": os.path.join(tmp, "cache.sqlite3"),
+            "redis": redis_url,
+        }
+        print(f"{REQUESTS} requests over {CITIES} cities "
+              f"({len(set(stream))} distinct, best possible hit rate {1 - len(set(stream)) / REQUESTS:.1%})")
+        print(f"{'backend':<8} {'workers':>7} {'hit rate':>9} {'upstream calls':>15}")
+        for kind, target in targets.items():
+            for workers in WORKER_COUNTS:
+                hit_rate, upstream_calls = run(kind, target, workers, stream)
+                print(f"{kind:<8} {workers:>7} {hit_rate:>9.1%} {upstream_calls:>15}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
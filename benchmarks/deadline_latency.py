@@ -0,0 +1,110 @@
+"""
+Tail latency of /api/plan_trip with and without a request deadline and hedging.
+
+OpenWeather and Gemini are replaced by simulated upstreams with a long tail
+(most calls are fast, a few stall), so the numbers only depend on how the
+request budget is enforced. Run from the repository root:
+
+    python benchmarks/deadline_latency.py
+"""
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from routes.travel import plan_trip
+from services import ai_itinerary, weather
+from services.deadline import percentile
+
+REQUESTS = 200
+# More concurrent requests than model threads (overload) and fewer (spare capacity)
+BUSY_CONCURRENCY = 32
+LIGHT_CONCURRENCY = 8
+
+rng = random.Random(7)
+model_calls = []
+
+
+def upstream_latency(fast, slow, slow_ratio):
+    return slow if rng.random() < slow_ratio else rng.uniform(*fast)
+
+
+def fake_weather_get(url, timeout, stream=False):
+    took = upstream_latency((0.02, 0.08), 3.0, 0.05)
+    time.sleep(min(took, timeout))
+    if took > timeout:
+        raise requests.exceptions.Timeout("simulated timeout")
+    body = json.dumps({
+        "list": [{"dt_txt": "2025-01-01 12:00:00", "main": {"temp": 20.0}, "weather": [{"description": "clear sky"}]}] * 8
+    }).encode()
+    response = mock.MagicMock()
+    response.__enter__.return_value = response
+    response.raw.read1.side_effect = [body, b""]
+    return response
+
+
+def fake_run_model(model_name, prompt, expires_at, generation_config=None):
+    model_calls.append(model_name)
+    # Same contract as run_model: the timeout starts counting when the call starts
+    timeout = expires_at - time.monotonic()
+    if timeout <= 0:
+        raise TimeoutError("deadline passed while queued")
+    took = upstream_latency((0.2, 0.6), 6.0, 0.1)
+    time.sleep(min(took, timeout))
+    if took > timeout:
+        raise TimeoutError("simulated model timeout")
+    days = [{"day": day, "title": "Simulated", "morning": ["Somewhere"]} for day in range(1, 4)]
+    return mock.Mock(text=json.dumps({"days": days}))
+
+
+def run(label, header, hedge_after, concurrency=BUSY_CONCURRENCY):
+    ai_itinerary.HEDGE_AFTER_SECONDS = hedge_after
+    ai_itinerary.hedge_budget = ai_itinerary.HedgeBudget()
+    model_calls.clear()
+    timings = []
+    answered = []
+
+    def one(i):
+        started = time.monotonic()
+        result = plan_trip(destination=f"{label}-city-{i}", days=3, preferences="food", start_date=None, x_request_timeout=header)
+        timings.append(time.monotonic() - started)
+        answered.append(result["itinerary_days"]["days"][0]["title"] == "Simulated")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(REQUESTS)))
+
+    timings.sort()
+    return (f"{label:<22} {concurrency:>4} concurrent  p50 {percentile(timings, 50) * 1000:>7.0f} ms"
+            f"  p95 {percentile(timings, 95) * 1000:>7.0f} ms"
+            f"  p99 {percentile(timings, 99) * 1000:>7.0f} ms"
+            f"  max {timings[-1] * 1000:>7.0f} ms"
+            f"  model answered {sum(answered) / len(answered):>6.1%}"
+            f"  hedges {sum(name != ai_itinerary.MODEL_CANDIDATES[0] for name in model_calls):>3}")
+
+
+def main():
+    with mock.patch.object(weather.requests, "get", fake_weather_get), \
+            mock.patch.object(ai_itinerary, "run_model", fake_run_model), \
+            mock.patch.object(ai_itinerary, "genai_configured", True), \
+            mock.patch("builtins.print"):
+        results = [
+            run("no deadline", "60", 0),
+            run("4s deadline", "4", 0),
+            run("4s deadline + hedge", "4", 0.8),
+            run("4s deadline", "4", 0, LIGHT_CONCURRENCY),
+            run("4s deadline + hedge", "4", 0.8, LIGHT_CONCURRENCY),
+        ]
+    print(f"{REQUESTS} requests per row, "
+          f"model pool of {ai_itinerary.MODEL_MAX_CONCURRENCY} threads (production size)")
+    print("\n".join(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Homepage throughput and bytes transferred, before and after the asset pipeline.
+
+"before" rebuilds the original setup: index.html rendered through Jinja2 on
+every hit and /static served uncompressed by StaticFiles. "after" is main.app
+with the pre-rendered homepage and fingerprinted, precompressed assets.
+Requests are sent straight to the ASGI app, so the numbers measure the app
+and not the network. Run from the repository root:
+
+    python benchmarks/homepage.py
+"""
+import asyncio
+import gzip
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+
+import main
+from services.assets import brotli
+
+DURATION_SECONDS = 3
+BROWSER_HEADERS = {"accept-encoding": "gzip, deflate, br"}
+
+
+def build_before_app():
+    app = FastAPI()
+    app.mount("/static", StaticFiles(directory="static"), name="static")
+    templates = Jinja2Templates(directory="templates")
+
+    @app.get("/", response_class=HTMLResponse)
+    async def home(request: Request):
+        return templates.TemplateResponse(
+            "index.html", {"request": request, "asset_url": lambda name: f"/static/{name}"}
+        )
+
+    return app
+
+
+async def request(app, path, headers=None):
+    """Send one GET through the ASGI interface and return (status, headers, body)"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(k.encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    response = {"body": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {k.decode().lower(): v.decode() for k, v in message["headers"]}
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], response["headers"], response["body"]
+
+
+async def requests_per_second(app):
+    count = 0
+    deadline = time.perf_counter() + DURATION_SECONDS
+    while time.perf_counter() < deadline:
+        await request(app, "/", BROWSER_HEADERS)
+        count += 1
+    return count / DURATION_SECONDS
+
+
+def decode(headers, body):
+    encoding = headers.get("content-encoding")
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "br":
+        return brotli.decompress(body)
+    return body
+
+
+async def page_visits(app):
+    """Requests and body bytes for a first and a repeat visit by the same browser"""
+    browser_cache = {}
+    results = []
+    for _ in range(2):
+        sent = transferred = 0
+        paths = ["/"]
+        while paths:
+            path = paths.pop(0)
+            cached = browser_cache.get(path)
+            if cached and "immutable" in cached[0].get("cache-control", ""):
+                continue
+            headers = dict(BROWSER_HEADERS)
+            if cached and "etag" in cached[0]:
+                headers["if-none-match"] = cached[0]["etag"]
+            status, response_headers, body = await request(app, path, headers)
+            sent += 1
+            transferred += len(body)
+            if status == 200:
+                cached = (response_headers, decode(response_headers, body))
+                browser_cache[path] = cached
+            if path == "/":
+                paths.extend(link.decode() for link in re.findall(rb'(?:href|src)="(/(?:static|assets)/[^"]+)"', cached[1]))
+        results.append((sent, transferred))
+    return results
+
+
+async def run():
+    before = build_before_app()
+    # Warm up both apps so startup work is not measured
+    await request(before, "/", BROWSER_HEADERS)
+    await request(main.app, "/", BROWSER_HEADERS)
+
+    rows = []
+    for label, app in (("before", before), ("after", main.app)):
+        rps = await requests_per_second(app)
+        (first_requests, first_bytes), (repeat_requests, repeat_bytes) = await page_visits(app)
+        rows.append((label, rps, first_requests, first_bytes, repeat_requests, repeat_bytes))
+
+    print(f"{'':<7} {'homepage req/s':>15} {'first visit (body)':>22} {'repeat visit (body)':>22}")
+    for label, rps, first_requests, first_bytes, repeat_requests, repeat_bytes in rows:
+        print(f"{label:<7} {rps:>15.0f} {first_requests:>5} req {first_bytes:>8} bytes "
+              f"{repeat_requests:>5} req {repeat_bytes:>8} bytes")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
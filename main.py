@@ -1,5 +1,5 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import os
@@ -7,6 +7,8 @@ import uvicorn
 
 # Import your route file
 from routes import travel
+from services.assets import HTML_CACHE_CONTROL, IMMUTABLE_CACHE_CONTROL, AssetPipeline
+from services.deadline import latency
 
 # Create FastAPI app
 app = FastAPI(title="Smart Travel Planner")
@@ -17,20 +19,48 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # ✅ Set up templates folder
 templates = Jinja2Templates(directory="templates")
 
+# ✅ Fingerprint + precompress static files and pre-render the homepage once at startup
+assets = AssetPipeline("static")
+homepage = assets.render_page(templates, "index.html")
+
+def asset_response(asset, request, cache_control):
+    """Serve an in-memory asset, honouring If-None-Match and Accept-Encoding"""
+    encoding, body = asset.negotiate(request.headers.get("accept-encoding"))
+    headers = {"Cache-Control": cache_control, "ETag": asset.etag(encoding), "Vary": "Accept-Encoding"}
+    if asset.not_modified(request.headers.get("if-none-match"), encoding):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=asset.content_type, headers=headers)
+
 # ✅ Include your backend routes
 app.include_router(travel.router, prefix="/api")
 
-# ✅ Homepage route (renders index.html)
+# ✅ Homepage route (serves the pre-rendered index.html)
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return asset_response(homepage, request, HTML_CACHE_CONTROL)
+
+# ✅ Fingerprinted static files, cached by browsers forever
+@app.get("/assets/{filename:path}")
+async def hashed_asset(filename: str, request: Request):
+    asset = assets.assets.get(filename)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return asset_response(asset, request, IMMUTABLE_CACHE_CONTROL)
 
 # ✅ Optional health check route
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "message": "Smart Travel Planner is running"}
+    return {
+        "status": "ok",
+        "message": "Smart Travel Planner is running",
+        "latency": latency.summary()
+    }
 
 # ✅ Only run with uvicorn when executed directly (for local development)
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=False)
\ No newline at end of file
+    # Set WEB_CONCURRENCY > 1 together with a shared CACHE_BACKEND for multi-worker runs
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=False, workers=workers)
\ No newline at end of file
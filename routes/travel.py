@@ -1,25 +1,30 @@
-from fastapi import APIRouter, Query, HTTPException
+import time
+from fastapi import APIRouter, Header, Query, HTTPException
+from services.deadline import Deadline, latency
 from services.weather import get_weather
-from services.ai_itinerary import generate_itinerary
+from services.ai_itinerary import RegenerationUnavailable, generate_itinerary, generate_structured_itinerary
 
 router = APIRouter()
 
 @router.get("/get_weather")
 def get_weather_route(
-    city: str = Query(..., description="City name")
+    city: str = Query(..., description="City name"),
+    x_request_timeout: str = Header(None, description="Latency budget in seconds")
 ):
     """
     Returns current weather + Gemini summary for a city
     """
     try:
-        weather_data = get_weather(city)
+        deadline = Deadline.from_header(x_request_timeout)
+        weather_data = get_weather(city, deadline)
 
         # Check if weather API returned an error
         if isinstance(weather_data, dict) and "error" in weather_data:
-            raise HTTPException(status_code=404, detail=weather_data["error"])
+            status_code = 504 if weather_data.get("timed_out") else 404
+            raise HTTPException(status_code=status_code, detail=weather_data["error"])
 
         # Generate AI summary
-        summary = generate_itinerary(city, 1, "general weather insights", weather_data)
+        summary = generate_itinerary(city, 1, "general weather insights", weather_data, deadline=deadline)
 
         return {
             "city": city,
@@ -40,11 +45,13 @@ def plan_trip(
     destination: str = Query(..., description="City name"),
     days: int = Query(3, description="Number of days"),
     preferences: str = Query("sightseeing, food, culture", description="User travel preferences"),
-    start_date: str = Query(None, description="Start date (YYYY-MM-DD)")
+    start_date: str = Query(None, description="Start date (YYYY-MM-DD)"),
+    x_request_timeout: str = Header(None, description="Latency budget in seconds")
 ):
     """
     Generate AI-based travel itinerary with weather forecast and seasonal recommendations
     """
+    started = time.monotonic()
     try:
         print(f"Plan trip called: {destination}, {days} days, {preferences}, start_date: {start_date}")
         
@@ -52,14 +59,24 @@ def plan_trip(
         if days < 1 or days > 30:
             raise HTTPException(status_code=400, detail="Trip duration must be between 1 and 30 days")
         
-        weather_data = get_weather(destination)
+        deadline = Deadline.from_header(x_request_timeout)
         
-        if isinstance(weather_data, dict) and "error" in weather_data:
+        weather_started = time.monotonic()
+        weather_data = get_weather(destination, deadline)
+        latency.record("weather", time.monotonic() - weather_started)
+        
+        # A slow forecast is dropped so the itinerary can still meet the deadline
+        if isinstance(weather_data, dict) and "error" in weather_data and not weather_data.get("timed_out"):
             print(f"Weather error: {weather_data['error']}")
             raise HTTPException(status_code=404, detail=weather_data["error"])
         
-        print(f"Generating itinerary for {days} days in {destination}...")
-        itinerary = generate_itinerary(destination, days, preferences, weather_data, start_date)
+        print(f"Generating itinerary for {days} days in {destination} ({deadline.remaining():.1f}s left)...")
+        itinerary_started = time.monotonic()
+        itinerary = generate_structured_itinerary(
+            destination, days, preferences, weather_data, start_date, deadline=deadline
+        )
+        latency.record("itinerary", time.monotonic() - itinerary_started)
+        latency.record("plan_trip", time.monotonic() - started)
         print(f"Successfully generated {days}-day itinerary for {destination}")
         
         return {
@@ -68,11 +85,59 @@ def plan_trip(
             "preferences": preferences,
             "start_date": start_date,
             "weather": weather_data,
-            "itinerary": itinerary
+            "itinerary": itinerary.to_markdown(),
+            "itinerary_days": itinerary.to_dict()
         }
     
     except HTTPException:
         raise
     except Exception as e:
         print(f"Error in plan_trip: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/regenerate_day")
+def regenerate_day(
+    destination: str = Query(..., description="City name"),
+    day: int = Query(..., description="Day number to regenerate"),
+    days: int = Query(3, description="Number of days"),
+    preferences: str = Query("sightseeing, food, culture", description="User travel preferences"),
+    start_date: str = Query(None, description="Start date (YYYY-MM-DD)"),
+    x_request_timeout: str = Header(None, description="Latency budget in seconds")
+):
+    """
+    Regenerate a single day of an itinerary, reusing the cached plan for the other days.
+    The new day is returned to this caller only; the shared cached day is left unchanged.
+    Returns 503 when the AI model cannot write a new day (the fallback templates never change).
+    """
+    try:
+        if days < 1 or days > 30:
+            raise HTTPException(status_code=400, detail="Trip duration must be between 1 and 30 days")
+        if day < 1 or day > days:
+            raise HTTPException(status_code=400, detail=f"Day must be between 1 and {days}")
+        
+        deadline = Deadline.from_header(x_request_timeout)
+        weather_data = get_weather(destination, deadline)
+        
+        if isinstance(weather_data, dict) and "error" in weather_data and not weather_data.get("timed_out"):
+            raise HTTPException(status_code=404, detail=weather_data["error"])
+        
+        try:
+            itinerary = generate_structured_itinerary(
+                destination, days, preferences, weather_data, start_date, regenerate=(day,), deadline=deadline
+            )
+        except RegenerationUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        
+        return {
+            "destination": destination,
+            "day": itinerary.days[day - 1].to_dict(),
+            "itinerary": itinerary.to_markdown(),
+            "itinerary_days": itinerary.to_dict()
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in regenerate_day: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
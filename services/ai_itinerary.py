@@ -1,8 +1,16 @@
 import os
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 import google.generativeai as genai
 from datetime import datetime
 
+from services.cache import itinerary_day_cache, model_cache, trip_notes_cache
+from services.deadline import FALLBACK_RESERVE_SECONDS, latency
+from services.itinerary_model import DayPlan, Itinerary, Slot, TripNotes
+
 load_dotenv()
 
 # Configure Gemini API
@@ -19,24 +27,109 @@ else:
         print(f"Error configuring Gemini API: {e}")
         genai_configured = False
 
-def get_correct_model():
+# From your console output, these models are available:
+MODEL_CANDIDATES = [
+    'models/gemini-2.0-flash',  # This should work
+    'models/gemini-2.0-flash-001',
+    'models/gemini-2.0-flash-exp',
+    'models/gemini-pro-latest',
+    'models/gemini-2.5-flash',
+]
+
+# Model call timeout when the caller gives no deadline
+MODEL_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", 30))
+
+# If the primary model has been running for this many seconds without an answer,
+# send the same request to the next model as well and use whichever answers first (0 = off)
+HEDGE_AFTER_SECONDS = float(os.getenv("GEMINI_HEDGE_AFTER_SECONDS", 0))
+
+# Hedges may add at most this fraction of extra model calls
+HEDGE_MAX_RATIO = float(os.getenv("GEMINI_HEDGE_MAX_RATIO", 0.1))
+
+# Model calls run here so they can be abandoned once the deadline passes
+MODEL_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 16))
+model_executor = ThreadPoolExecutor(max_workers=MODEL_MAX_CONCURRENCY)
+
+class HedgeBudget:
+    """
+    Token bucket for hedged requests: every model call earns `ratio` of a
+    token and every hedge spends one, so when many calls are slow at once
+    only a small share of them is duplicated
+    """
+
+    def __init__(self, ratio=HEDGE_MAX_RATIO, burst=5):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = float(burst)
+        self.lock = threading.Lock()
+
+    def earn(self):
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def spend(self):
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+hedge_budget = HedgeBudget()
+
+class ModelCall:
+    """
+    One run_model call on model_executor. `started_at` is set when a pool
+    thread picks it up, so time spent waiting in the queue isn't counted as
+    the model being slow.
+    """
+
+    in_flight = 0
+    lock = threading.Lock()
+
+    def __init__(self, model_name, prompt, expires_at, generation_config=None):
+        self.model_name = model_name
+        self.started_at = None
+        with ModelCall.lock:
+            ModelCall.in_flight += 1
+        self.future = model_executor.submit(self._run, prompt, expires_at, generation_config)
+        self.future.add_done_callback(self._finished)
+
+    def _run(self, prompt, expires_at, generation_config):
+        self.started_at = time.monotonic()
+        return run_model(self.model_name, prompt, expires_at, generation_config)
+
+    @staticmethod
+    def _finished(future):
+        with ModelCall.lock:
+            ModelCall.in_flight -= 1
+
+    def running_for(self):
+        """Seconds since a pool thread started this call, 0 while it is queued"""
+        return 0.0 if self.started_at is None else time.monotonic() - self.started_at
+
+    @classmethod
+    def pool_has_free_thread(cls):
+        with cls.lock:
+            return cls.in_flight < MODEL_MAX_CONCURRENCY
+
+class RegenerationUnavailable(Exception):
+    """A day was asked to be regenerated but the model could not write a new one"""
+
+def get_correct_model(deadline=None):
     """
     Use the exact model names from your available list
     """
-    # From your console output, these models are available:
-    correct_models = [
-        'models/gemini-2.0-flash',  # This should work
-        'models/gemini-2.0-flash-001',
-        'models/gemini-2.0-flash-exp',
-        'models/gemini-pro-latest',
-        'models/gemini-2.5-flash',
-    ]
+    # Reuse the model another request (or worker) already resolved
+    cached_model = model_cache.get("resolved", deadline=deadline)
+    if cached_model:
+        return cached_model
     
-    for model_name in correct_models:
+    for model_name in MODEL_CANDIDATES:
         try:
             # Test the model
             model = genai.GenerativeModel(model_name)
             print(f"✅ Model {model_name} is available and working")
+            model_cache.set("resolved", model_name, deadline=deadline)
             return model_name
         except Exception as e:
             print(f"❌ Model {model_name} failed: {str(e)[:100]}...")
@@ -45,7 +138,135 @@ def get_correct_model():
     print("❌ No working models found from the list")
     return None
 
-def generate_itinerary(destination, days, preferences, weather_data, start_date=None):
+def get_hedge_model(model_name):
+    """Next model after `model_name` in MODEL_CANDIDATES, used for hedged requests"""
+    if model_name in MODEL_CANDIDATES:
+        index = MODEL_CANDIDATES.index(model_name)
+        if index + 1 < len(MODEL_CANDIDATES):
+            return MODEL_CANDIDATES[index + 1]
+    return None
+
+def model_timeout(deadline=None):
+    """Seconds a model call may take, leaving room for the fallback itinerary"""
+    if deadline is None:
+        return MODEL_TIMEOUT_SECONDS
+    return min(MODEL_TIMEOUT_SECONDS, max(0.0, deadline.remaining() - FALLBACK_RESERVE_SECONDS))
+
+def run_model(model_name, prompt, expires_at, generation_config=None):
+    """
+    Runs on model_executor. The timeout is taken from the absolute `expires_at`
+    when the call actually starts, so a call that waited in the queue never
+    outlives the caller, and one whose time is already up is skipped.
+    """
+    timeout = expires_at - time.monotonic()
+    if timeout <= 0:
+        raise TimeoutError(f"Skipped {model_name}: deadline passed while queued")
+    model = genai.GenerativeModel(model_name)
+    return model.generate_content(
+        prompt,
+        generation_config=generation_config,
+        request_options={"timeout": timeout},
+    )
+
+def call_model(model_name, prompt, timeout, generation_config=None):
+    """
+    Call Gemini within `timeout` seconds. When hedging is enabled and the primary
+    model has been running for HEDGE_AFTER_SECONDS (or fails), the next model gets
+    the same request and the first successful answer wins. A slow primary is only
+    hedged while the pool has a free thread and the hedge budget allows it.
+    Raises TimeoutError once the time is up.
+    """
+    start = time.monotonic()
+    expires_at = start + timeout
+    hedge_model = get_hedge_model(model_name) if HEDGE_AFTER_SECONDS > 0 else None
+    if hedge_model:
+        hedge_budget.earn()
+    primary = ModelCall(model_name, prompt, expires_at, generation_config)
+    pending = {primary.future: primary}
+    last_error = None
+    
+    while pending:
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            break
+        wait_for = remaining
+        if hedge_model:
+            # While the primary is queued this is a lower bound; the check below repeats it
+            wait_for = min(remaining, max(0.0, HEDGE_AFTER_SECONDS - primary.running_for()))
+        
+        done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = pending.pop(future).model_name
+            try:
+                response = future.result()
+            except Exception as e:
+                print(f"❌ Model {name} failed: {str(e)[:100]}...")
+                last_error = e
+                continue
+            latency.record("model", time.monotonic() - start)
+            if name != model_name:
+                print(f"✅ Hedged request to {name} answered first")
+            return response
+        
+        if not hedge_model:
+            continue
+        if not pending:
+            # The primary failed, so the hedge takes its place instead of adding load
+            print(f"⏱️ {model_name} failed, retrying with {hedge_model}")
+        elif primary.running_for() < HEDGE_AFTER_SECONDS:
+            continue
+        elif not (ModelCall.pool_has_free_thread() and hedge_budget.spend()):
+            print(f"⏱️ Not hedging {model_name}: model pool busy or hedge budget spent")
+            hedge_model = None
+            continue
+        else:
+            print(f"⏱️ Hedging {model_name} with {hedge_model}")
+        call = ModelCall(hedge_model, prompt, expires_at, generation_config)
+        pending[call.future] = call
+        hedge_model = None
+    
+    # Queued calls are cancelled; running ones stop at expires_at via their own timeout
+    for future in pending:
+        future.cancel()
+    latency.record("model", time.monotonic() - start)
+    if last_error is not None and not pending:
+        raise last_error
+    raise TimeoutError(f"Model did not answer within {timeout:.1f}s")
+
+# Closing line of every itinerary prompt
+REAL_PLACES_REMINDER = "IMPORTANT: All locations must be REAL and actually exist in {destination}. No made-up places."
+
+def summarize_weather(weather_data):
+    """Forecast lines for the prompt, or a note when the forecast is missing"""
+    if isinstance(weather_data, dict) and "error" in weather_data:
+        return "Weather data unavailable"
+    return "\n".join([
+        f"- {w['datetime']}: {w['condition']}, {w['temp']}°C"
+        for w in weather_data[:5] if 'condition' in w
+    ])
+
+def prompt_requirements(destination, preferences, weather_data, seasonal_info="", days=None):
+    """
+    Rules and trip facts shared by the markdown and the JSON itinerary prompts,
+    so the two generators ask the model for the same kind of places
+    """
+    duration = f"\n**Duration:** {days} days" if days else ""
+    return f"""**CRITICAL REQUIREMENTS:**
+1. Use ONLY real, existing locations in {destination}
+2. Include specific street names, neighborhoods, and districts
+3. Mention actual restaurants, cafes, and their specialties
+4. Include real landmarks, museums, parks with exact names
+5. Provide practical transportation details between locations
+6. Suggest specific local dishes and where to find them
+7. Include realistic timing and duration for each activity
+8. Consider geographic logic - group nearby attractions
+
+**Destination:** {destination}{duration}
+**Interests:** {preferences}
+**Weather:** {summarize_weather(weather_data)}
+{seasonal_info}"""
+
+def generate_itinerary(destination, days, preferences, weather_data, start_date=None, deadline=None):
     """
     Generate a detailed travel itinerary for ANY city worldwide
     """
@@ -54,16 +275,6 @@ def generate_itinerary(destination, days, preferences, weather_data, start_date=
             print("Gemini API not configured, using universal detailed fallback")
             return generate_universal_detailed_itinerary(destination, days, preferences, weather_data, start_date)
         
-        # Check if weather_data has an error
-        if isinstance(weather_data, dict) and "error" in weather_data:
-            weather_summary = "Weather data unavailable"
-        else:
-            # Create weather summary from forecast
-            weather_summary = "\n".join([
-                f"- {w['datetime']}: {w['condition']}, {w['temp']}°C" 
-                for w in weather_data[:5] if 'condition' in w
-            ])
-        
         # Add seasonal information if start_date is provided
         seasonal_info = ""
         if start_date:
@@ -78,21 +289,7 @@ def generate_itinerary(destination, days, preferences, weather_data, start_date=
         prompt = f"""
 You are an expert local travel guide for {destination}. Create a detailed {days}-day itinerary focusing on {preferences}.
 
-**CRITICAL REQUIREMENTS:**
-1. Use ONLY real, existing locations in {destination}
-2. Include specific street names, neighborhoods, and districts
-3. Mention actual restaurants, cafes, and their specialties
-4. Include real landmarks, museums, parks with exact names
-5. Provide practical transportation details between locations
-6. Suggest specific local dishes and where to find them
-7. Include realistic timing and duration for each activity
-8. Consider geographic logic - group nearby attractions
-
-**Destination:** {destination}
-**Duration:** {days} days
-**Interests:** {preferences}
-**Weather:** {weather_summary}
-{seasonal_info}
+{prompt_requirements(destination, preferences, weather_data, seasonal_info, days=days)}
 
 **FORMAT EACH DAY LIKE THIS:**
 
@@ -142,20 +339,24 @@ You are an expert local travel guide for {destination}. Create a detailed {days}
 - Dress codes if any
 - Tipping customs
 
-IMPORTANT: All locations must be REAL and actually exist in {destination}. No made-up places.
+{REAL_PLACES_REMINDER.format(destination=destination)}
 """
 
         print(f"Generating AI itinerary for {days} days in {destination}")
         
         # Get the correct model
-        model_name = get_correct_model()
+        model_name = get_correct_model(deadline)
         if not model_name:
             print("No working models found, using universal detailed fallback")
             return generate_universal_detailed_itinerary(destination, days, preferences, weather_data, start_date)
         
+        timeout = model_timeout(deadline)
+        if timeout <= 0:
+            print("No time left before the deadline, using universal detailed fallback")
+            return generate_universal_detailed_itinerary(destination, days, preferences, weather_data, start_date)
+        
         print(f"Using model: {model_name}")
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(prompt)
+        response = call_model(model_name, prompt, timeout)
         
         print(f"✅ Successfully generated {days}-day itinerary for {destination}")
         return response.text
@@ -165,6 +366,207 @@ IMPORTANT: All locations must be REAL and actually exist in {destination}. No ma
         print("Using universal detailed fallback itinerary")
         return generate_universal_detailed_itinerary(destination, days, preferences, weather_data, start_date)
 
+# Coarse forecast kinds for cache keys, checked in order against the description
+WEATHER_KINDS = (
+    ("storm", ("thunder",)),
+    ("snow", ("snow", "sleet")),
+    ("rain", ("rain", "drizzle", "shower")),
+    ("fog", ("mist", "fog", "haze", "smoke", "dust")),
+    ("clear", ("clear",)),
+    ("clouds", ("cloud",)),
+)
+
+def weather_signature(weather_data):
+    """
+    Coarse summary of the forecast the prompt was written for: the kinds of
+    weather and a 10°C temperature band, e.g. "clouds+rain/10". None when
+    there is no forecast.
+    """
+    if not weather_data or isinstance(weather_data, dict):
+        return None
+    entries = [w for w in weather_data[:5] if 'condition' in w]
+    if not entries:
+        return None
+    kinds = set()
+    for w in entries:
+        condition = w['condition'].lower()
+        kinds.add(next((kind for kind, words in WEATHER_KINDS if any(word in condition for word in words)), "other"))
+    band = int(sum(w['temp'] for w in entries) / len(entries) // 10 * 10)
+    return f"{'+'.join(sorted(kinds))}/{band}"
+
+def day_cache_key(source, destination, preferences, season, day, days, weather=None):
+    """
+    Cache key for a single itinerary day. Only whether the day is the last one
+    depends on the trip length, so extending a trip reuses the earlier days.
+    Gemini days are planned around the forecast, so they also carry its
+    `weather_signature`; a day written for rain is not served on a sunny week.
+    """
+    return (source, destination.strip().lower(), preferences.strip().lower(), season, weather, day, day == days)
+
+def trip_notes_key(destination, preferences, season):
+    """Cache key for the trip-level notes, which do not depend on the trip length"""
+    return (destination.strip().lower(), preferences.strip().lower(), season)
+
+def generate_structured_itinerary(destination, days, preferences, weather_data, start_date=None, regenerate=(), deadline=None):
+    """
+    Generate a typed per-day itinerary. Days already in the cache are reused and
+    only missing days (or those listed in `regenerate`) are generated. Days the
+    model cannot deliver before the deadline come from the fallback templates,
+    except regenerated ones: those raise RegenerationUnavailable. Regenerated days are returned to the caller only and never replace the
+    shared cached day, so one user's regeneration doesn't change anyone else's trip.
+    """
+    header = build_trip_header(destination, days, preferences, weather_data, start_date)
+    footer = build_trip_footer(destination, preferences)
+    
+    model_name = get_correct_model(deadline) if genai_configured else None
+    if not model_name:
+        # The templates are fixed, so "regenerating" one would return the same day
+        if regenerate:
+            raise RegenerationUnavailable("Regenerating a day needs the AI model, which is unavailable")
+        print("Gemini unavailable, using structured fallback itinerary")
+        plans = [get_template_day(destination, day, days, preferences, deadline=deadline) for day in range(1, days + 1)]
+        return Itinerary(destination, plans, header=header, footer=footer, source="fallback")
+    
+    season = None
+    if start_date:
+        try:
+            season = get_season(datetime.strptime(start_date, "%Y-%m-%d").month)
+        except ValueError:
+            season = None
+    
+    cached_notes = trip_notes_cache.get(trip_notes_key(destination, preferences, season), deadline=deadline)
+    notes = TripNotes.from_dict(cached_notes) if cached_notes is not None else None
+    
+    weather = weather_signature(weather_data)
+    plans = {}
+    missing = []
+    for day in range(1, days + 1):
+        key = day_cache_key("gemini", destination, preferences, season, day, days, weather)
+        cached = None if day in regenerate else itinerary_day_cache.get(key, deadline=deadline)
+        if cached is not None:
+            plans[day] = DayPlan.from_dict(cached)
+        else:
+            missing.append(day)
+    
+    if missing or notes is None:
+        print(f"Generating AI days {missing} for {destination} ({len(plans)} cached)")
+        try:
+            generated, generated_notes = generate_ai_days(
+                model_name, destination, days, missing, preferences, weather_data, season, model_timeout(deadline),
+                include_notes=notes is None,
+                kept_days=[plans[day] for day in sorted(plans)],
+            )
+        except Exception as e:
+            print(f"❌ AI day generation failed: {e}")
+            generated, generated_notes = {}, None
+        
+        if generated_notes is not None and not generated_notes.is_empty():
+            notes = generated_notes
+            trip_notes_cache.set(trip_notes_key(destination, preferences, season), notes.to_dict(), deadline=deadline)
+        
+        for day in missing:
+            if day in generated:
+                plans[day] = generated[day]
+                if day in regenerate:
+                    continue
+                itinerary_day_cache.set(
+                    day_cache_key("gemini", destination, preferences, season, day, days, weather),
+                    generated[day].to_dict(),
+                    deadline=deadline,
+                )
+            elif day in regenerate:
+                raise RegenerationUnavailable(f"The AI model could not regenerate day {day} in time")
+            else:
+                # Fallback days are not stored under the Gemini key so they are retried next time
+                plans[day] = get_template_day(destination, day, days, preferences, deadline=deadline)
+    
+    # City-specific notes from the model replace the generic practical information
+    return Itinerary(
+        destination,
+        [plans[day] for day in range(1, days + 1)],
+        header=header,
+        footer=footer if notes is None or notes.is_empty() else "",
+        source="gemini",
+        notes=notes,
+    )
+
+def generate_ai_days(model_name, destination, days, day_numbers, preferences, weather_data, season=None, timeout=None,
+                     include_notes=False, kept_days=()):
+    """
+    Ask Gemini for the given days (and optionally the trip notes) as JSON.
+    `kept_days` are the days of the trip that stay as they are; the model is
+    told not to repeat their places. Returns ({day: DayPlan}, TripNotes or None).
+    """
+    seasonal_info = f"\n**Travel Season:** {season}" if season else ""
+    requested = ", ".join(str(day) for day in day_numbers) or "none"
+    
+    kept_instructions = ""
+    if kept_days:
+        kept_lines = []
+        for plan in kept_days:
+            places = "; ".join(item for slot in plan.slots() for item in slot.items)
+            kept_lines.append(f"- Day {plan.day}: {plan.title} ({places})")
+        kept_instructions = (
+            "\nThese days are already planned and stay as they are. Do NOT repeat their landmarks, "
+            "restaurants or venues:\n" + "\n".join(kept_lines) + "\n"
+        )
+    
+    notes_instructions = ""
+    notes_schema = ""
+    if include_notes:
+        notes_instructions = f"""
+Also write trip notes specific to {destination}: must-try local foods with the
+restaurant or area to find them, transportation tips (best areas to stay,
+public transport, walking routes), a budget estimate (accommodation ranges,
+food costs per day, activity expenses) and local customs (etiquette, dress
+codes, tipping).
+"""
+        notes_schema = """,
+ "notes": {"must_try_foods": ["Dish at specific restaurant/area"], "transportation_tips": ["..."],
+           "budget_estimate": ["..."], "local_customs": ["..."]}"""
+    
+    prompt = f"""
+You are an expert local travel guide for {destination}. The trip lasts {days} days and focuses on {preferences}.
+Write ONLY these days of the itinerary: {requested}. Day {days} is the departure day.
+
+{prompt_requirements(destination, preferences, weather_data, seasonal_info)}
+{kept_instructions}{notes_instructions}
+Respond with JSON only, in exactly this shape:
+{{"days": [{{"day": 1, "title": "SPECIFIC THEME/AREA",
+  "morning": {{"theme": "short theme", "items": ["Actual place - street/area - what to do"]}},
+  "lunch": {{"theme": "short theme", "items": ["Actual restaurant - area - must-try dishes, price range"]}},
+  "afternoon": {{"theme": "short theme", "items": ["..."]}},
+  "evening": {{"theme": "short theme", "items": ["..."]}}}}]{notes_schema}}}
+
+{REAL_PLACES_REMINDER.format(destination=destination)}
+"""
+    
+    if timeout is None:
+        timeout = MODEL_TIMEOUT_SECONDS
+    if timeout <= 0:
+        raise TimeoutError("No time left before the deadline")
+    
+    response = call_model(
+        model_name,
+        prompt,
+        timeout,
+        generation_config={"response_mime_type": "application/json"},
+    )
+    data = json.loads(response.text)
+    
+    generated = {}
+    for entry in data.get("days", []) if isinstance(data, dict) else []:
+        # A malformed day only costs that day; the others are still used
+        try:
+            day = int(entry.get("day"))
+            if day in day_numbers:
+                generated[day] = DayPlan.from_dict(entry, day=day)
+        except Exception as e:
+            print(f"❌ Skipping malformed AI day {entry!r:.100}: {e}")
+    
+    notes = TripNotes.from_dict(data.get("notes")) if include_notes and isinstance(data, dict) else None
+    return generated, notes
+
 def get_season(month):
     """Determine season based on month"""
     if month in [12, 1, 2]:
@@ -181,7 +583,10 @@ def generate_universal_detailed_itinerary(destination, days, preferences, weathe
     Generate a smart, detailed itinerary for ANY city worldwide
     """
     print(f"Creating universal detailed itinerary for {days} days in {destination}")
-    
+    return build_fallback_itinerary(destination, days, preferences, weather_data, start_date).to_markdown()
+
+def build_trip_header(destination, days, preferences, weather_data, start_date=None):
+    """Title block shown above the day-by-day plan"""
     seasonal_info = ""
     if start_date:
         try:
@@ -198,258 +603,16 @@ def generate_universal_detailed_itinerary(destination, days, preferences, weathe
         conditions = [w['condition'] for w in weather_data[:3]]
         weather_info = f"\n🌤️ Weather: {avg_temp:.1f}°C, {', '.join(set(conditions))}"
     
-    # Get smart itinerary based on preferences and destination type
-    detailed_content = generate_smart_universal_itinerary(destination, days, preferences)
-    
-    itinerary = f"""
+    return f"""
 🗺️ {days}-Day Travel Plan for {destination}
 {seasonal_info}{weather_info}
 
 Travel Style: {preferences}
-
-{detailed_content}
-
-💡 **Travel Planning Tips for {destination}:**
-
-**To Get Specific Locations:**
-• Use Google Maps to find restaurants near major attractions
-• Check TripAdvisor for top-rated local eateries
-• Visit official tourism websites for current information
-• Ask hotel concierge for local recommendations
-
-**Research Tools:**
-• Google Maps: For exact addresses and directions
-• TripAdvisor: For restaurant reviews and ratings
-• Official tourism websites: For current hours and prices
-• Travel blogs: For recent visitor experiences
-"""
-    
-    return itinerary
-
-def generate_smart_universal_itinerary(destination, days, preferences):
-    """
-    Generate intelligent itinerary for ANY city based on destination type and preferences
-    """
-    
-    # Analyze preferences to customize the itinerary
-    has_adventure = any(word in preferences.lower() for word in ['adventure', 'hiking', 'outdoor', 'trekking'])
-    has_culture = any(word in preferences.lower() for word in ['culture', 'historical', 'heritage', 'museum'])
-    has_food = any(word in preferences.lower() for word in ['food', 'cuisine', 'restaurant', 'culinary'])
-    has_relaxation = any(word in preferences.lower() for word in ['relax', 'beach', 'spa', 'wellness'])
-    has_shopping = any(word in preferences.lower() for word in ['shopping', 'market', 'mall', 'boutique'])
-    
-    itinerary = ""
-    
-    for day in range(1, days + 1):
-        if day == 1:
-            # Day 1: Arrival and Orientation
-            itinerary += f"""
-**DAY 1: ARRIVAL & CITY ORIENTATION**
-
-🌅 **MORNING (8:00 AM - 12:00 PM): ARRIVAL & SETTLEMENT**
-• Arrive in {destination} and check into your accommodation
-• Get local SIM card and currency exchange
-• Familiarize yourself with the neighborhood
-• Identify nearby restaurants and convenience stores
-
-🍽️ **LUNCH (12:00 PM - 1:30 PM): LOCAL INTRODUCTION**
-• Try a well-rated local restaurant near your accommodation
-• Sample basic regional dishes to understand local cuisine
-• Observe local dining customs and etiquette
-
-🏛️ **AFTERNOON (1:30 PM - 5:00 PM): INITIAL EXPLORATION**
-• Visit the main city center or central square
-• Locate tourist information centers for maps and advice
-• Identify public transportation hubs and routes
-• Take a walking tour of immediate surroundings
-
-🌃 **EVENING (6:00 PM - 9:00 PM): FIRST IMPRESSIONS**
-• Dinner at a recommended local establishment
-• Evening stroll through popular local areas
-• Plan next day's activities based on initial observations
-"""
-        
-        elif day == 2:
-            # Day 2: Major Attractions based on preferences
-            morning_activities = ""
-            afternoon_activities = ""
-            
-            if has_culture:
-                morning_activities = f"""
-• Visit the most famous historical landmarks in {destination}
-• Explore main museums or cultural heritage sites
-• Learn about local history and significant events"""
-                
-                afternoon_activities = f"""
-• Continue cultural exploration with additional sites
-• Visit religious or architectural landmarks
-• Explore local art galleries or cultural centers"""
-            
-            elif has_adventure:
-                morning_activities = f"""
-• Start with outdoor activities around {destination}
-• Explore natural parks or hiking trails
-• Adventure sports or physical activities"""
-                
-                afternoon_activities = f"""
-• Continue with nature exploration
-• Visit scenic viewpoints or natural wonders
-• Outdoor photography and exploration"""
-            
-            else:  # General sightseeing
-                morning_activities = f"""
-• Visit iconic landmarks and must-see attractions
-• Explore famous neighborhoods and districts
-• Photography at key city viewpoints"""
-                
-                afternoon_activities = f"""
-• Continue sightseeing at major attractions
-• Explore different areas of the city
-• Visit popular local gathering spots"""
-            
-            itinerary += f"""
-**DAY 2: MAJOR ATTRACTIONS & LANDMARKS**
-
-🌅 **MORNING (8:00 AM - 12:00 PM): KEY SIGHTSEEING**
-{morning_activities}
-
-🍽️ **LUNCH (12:00 PM - 1:30 PM): AUTHENTIC CUISINE**
-• Traditional restaurant serving local specialties
-• Try regional dishes unique to {destination}
-• Experience local dining atmosphere
-
-🏛️ **AFTERNOON (1:30 PM - 5:00 PM): CONTINUED EXPLORATION**
-{afternoon_activities}
-
-🌃 **EVENING (6:00 PM - 9:00 PM): LOCAL EXPERIENCES**
-• Dinner featuring regional culinary specialties
-• Evening entertainment or cultural performances
-• Night markets or illuminated landmarks
-"""
-        
-        elif day == 3:
-            # Day 3: Specialized experiences based on preferences
-            specialized_morning = ""
-            specialized_afternoon = ""
-            
-            if has_food:
-                specialized_morning = f"""
-• Food market tour or culinary district exploration
-• Cooking class or food tasting experience
-• Visit local producers or specialty food shops"""
-                
-                specialized_afternoon = f"""
-• Continue food exploration in different neighborhoods
-• Street food tasting tour
-• Visit famous local eateries or food institutions"""
-            
-            elif has_shopping:
-                specialized_morning = f"""
-• Explore main shopping districts in {destination}
-• Visit local markets for crafts and souvenirs
-• Boutique and specialty store exploration"""
-                
-                specialized_afternoon = f"""
-• Continue shopping in different areas
-• Visit shopping malls or commercial centers
-• Local craft and artisan workshops"""
-            
-            elif has_relaxation:
-                specialized_morning = f"""
-• Visit parks, gardens, or peaceful areas
-• Relaxation activities or spa experiences
-• Scenic and tranquil location exploration"""
-                
-                specialized_afternoon = f"""
-• Continue relaxation and leisure activities
-• Visit beaches, lakes, or natural retreats
-• Wellness and rejuvenation experiences"""
-            
-            else:  # Mixed experiences
-                specialized_morning = f"""
-• Explore different neighborhoods of {destination}
-• Visit local markets and community areas
-• Discover hidden gems off the main tourist trail"""
-                
-                specialized_afternoon = f"""
-• Personalized activities based on your interests
-• Return to favorite spots for deeper exploration
-• Local experiences and interactions"""
-            
-            itinerary += f"""
-**DAY 3: SPECIALIZED EXPERIENCES**
-
-🌅 **MORNING (8:00 AM - 12:00 PM): FOCUSED EXPLORATION**
-{specialized_morning}
-
-🍽️ **LUNCH (12:00 PM - 1:30 PM): CULINARY ADVENTURE**
-• Try new local dishes or street food specialties
-• Visit food markets or local eateries
-• Experience diverse local cuisine
-
-🏛️ **AFTERNOON (1:30 PM - 5:00 PM): CONTINUED SPECIALIZATION**
-{specialized_afternoon}
-
-🌃 **EVENING (6:00 PM - 9:00 PM): UNIQUE EXPERIENCES**
-• Special dinner at unique or highly-rated restaurant
-• Evening activities matching your interests
-• Local nightlife or cultural events
 """
-        
-        else:
-            # Additional days - more specialized or relaxed
-            if day == days:  # Last day
-                itinerary += f"""
-**DAY {day}: FINAL EXPLORATIONS & DEPARTURE PREPARATION**
-
-🌅 **MORNING (8:00 AM - 12:00 PM): LAST OPPORTUNITIES**
-• Visit any remaining must-see attractions
-• Return to favorite spots for final experiences
-• Last-minute souvenir shopping
-
-🍽️ **LUNCH (12:00 PM - 1:30 PM): FAREWELL MEAL**
-• Enjoy final local cuisine experiences
-• Visit highly recommended restaurants missed earlier
-• Try dishes you haven't experienced yet
-
-🏛️ **AFTERNOON (1:30 PM - 5:00 PM): RELAXED FINALE**
-• Leisurely activities and final explorations
-• Visit parks, gardens, or relaxing spots
-• Preparation for departure
-
-🌃 **EVENING (6:00 PM - 9:00 PM): DEPARTURE**
-• Special farewell dinner
-• Final evening stroll and photography
-• Travel to airport or departure point
-"""
-            else:  # Middle days
-                itinerary += f"""
-**DAY {day}: DEEPER EXPLORATION**
-
-🌅 **MORNING (8:00 AM - 12:00 PM): EXPANDED HORIZONS**
-• Explore less-visited areas of {destination}
-• Visit specialized museums or attractions
-• Local neighborhood immersion
-
-🍽️ **LUNCH (12:00 PM - 1:30 PM): CONTINUED CULINARY JOURNEY**
-• Try different types of local cuisine
-• Explore food from various regions or cultures
-• Restaurant hopping or food court exploration
-
-🏛️ **AFTERNOON (1:30 PM - 5:00 PM): ENRICHING EXPERIENCES**
-• Cultural workshops or local activities
-• Guided tours or specialized experiences
-• Personal interest exploration
-
-🌃 **EVENING (6:00 PM - 9:00 PM): EVENING DELIGHTS**
-• Dinner at different types of establishments
-• Evening entertainment or shows
-• Local social experiences
-"""
-    
-    # Add destination-specific practical information
-    itinerary += f"""
 
+def build_trip_footer(destination, preferences):
+    """Practical information and research tips shown after the last day"""
+    return f"""
 🎯 **PRACTICAL INFORMATION FOR {destination.upper()}:**
 
 **General Travel Tips:**
@@ -484,9 +647,256 @@ def generate_smart_universal_itinerary(destination, days, preferences):
 • Check recent reviews on TripAdvisor
 • Consult official tourism websites
 • Ask locals for current recommendations
+
+💡 **Travel Planning Tips for {destination}:**
+
+**To Get Specific Locations:**
+• Use Google Maps to find restaurants near major attractions
+• Check TripAdvisor for top-rated local eateries
+• Visit official tourism websites for current information
+• Ask hotel concierge for local recommendations
+
+**Research Tools:**
+• Google Maps: For exact addresses and directions
+• TripAdvisor: For restaurant reviews and ratings
+• Official tourism websites: For current hours and prices
+• Travel blogs: For recent visitor experiences
 """
+
+def build_fallback_itinerary(destination, days, preferences, weather_data, start_date=None):
+    """Structured fallback itinerary built entirely from the day templates"""
+    return Itinerary(
+        destination,
+        [get_template_day(destination, day, days, preferences) for day in range(1, days + 1)],
+        header=build_trip_header(destination, days, preferences, weather_data, start_date),
+        footer=build_trip_footer(destination, preferences),
+        source="fallback",
+    )
+
+def generate_smart_universal_itinerary(destination, days, preferences):
+    """
+    Generate intelligent itinerary for ANY city based on destination type and preferences
+    """
+    itinerary = Itinerary(
+        destination,
+        [get_template_day(destination, day, days, preferences) for day in range(1, days + 1)],
+    )
+    return itinerary.to_markdown()
+
+def get_template_day(destination, day, days, preferences, deadline=None):
+    """Return a fallback template day, reusing the per-day cache when possible"""
+    key = day_cache_key("fallback", destination, preferences, None, day, days)
+    cached = itinerary_day_cache.get(key, deadline=deadline)
+    if cached is not None:
+        return DayPlan.from_dict(cached)
+    plan = build_template_day(destination, day, days, preferences)
+    itinerary_day_cache.set(key, plan.to_dict(), deadline=deadline)
+    return plan
+
+def build_template_day(destination, day, days, preferences):
+    """
+    Build one day of the fallback itinerary based on destination and preferences
+    """
+    # Analyze preferences to customize the itinerary
+    has_adventure = any(word in preferences.lower() for word in ['adventure', 'hiking', 'outdoor', 'trekking'])
+    has_culture = any(word in preferences.lower() for word in ['culture', 'historical', 'heritage', 'museum'])
+    has_food = any(word in preferences.lower() for word in ['food', 'cuisine', 'restaurant', 'culinary'])
+    has_relaxation = any(word in preferences.lower() for word in ['relax', 'beach', 'spa', 'wellness'])
+    has_shopping = any(word in preferences.lower() for word in ['shopping', 'market', 'mall', 'boutique'])
+    
+    if day == 1:
+        # Day 1: Arrival and Orientation
+        return DayPlan(
+            1, "ARRIVAL & CITY ORIENTATION",
+            Slot("morning", "ARRIVAL & SETTLEMENT", [
+                f"Arrive in {destination} and check into your accommodation",
+                "Get local SIM card and currency exchange",
+                "Familiarize yourself with the neighborhood",
+                "Identify nearby restaurants and convenience stores",
+            ]),
+            Slot("lunch", "LOCAL INTRODUCTION", [
+                "Try a well-rated local restaurant near your accommodation",
+                "Sample basic regional dishes to understand local cuisine",
+                "Observe local dining customs and etiquette",
+            ]),
+            Slot("afternoon", "INITIAL EXPLORATION", [
+                "Visit the main city center or central square",
+                "Locate tourist information centers for maps and advice",
+                "Identify public transportation hubs and routes",
+                "Take a walking tour of immediate surroundings",
+            ]),
+            Slot("evening", "FIRST IMPRESSIONS", [
+                "Dinner at a recommended local establishment",
+                "Evening stroll through popular local areas",
+                "Plan next day's activities based on initial observations",
+            ]),
+        )
+    
+    if day == 2:
+        # Day 2: Major Attractions based on preferences
+        if has_culture:
+            morning_activities = [
+                f"Visit the most famous historical landmarks in {destination}",
+                "Explore main museums or cultural heritage sites",
+                "Learn about local history and significant events",
+            ]
+            afternoon_activities = [
+                "Continue cultural exploration with additional sites",
+                "Visit religious or architectural landmarks",
+                "Explore local art galleries or cultural centers",
+            ]
+        elif has_adventure:
+            morning_activities = [
+                f"Start with outdoor activities around {destination}",
+                "Explore natural parks or hiking trails",
+                "Adventure sports or physical activities",
+            ]
+            afternoon_activities = [
+                "Continue with nature exploration",
+                "Visit scenic viewpoints or natural wonders",
+                "Outdoor photography and exploration",
+            ]
+        else:  # General sightseeing
+            morning_activities = [
+                "Visit iconic landmarks and must-see attractions",
+                "Explore famous neighborhoods and districts",
+                "Photography at key city viewpoints",
+            ]
+            afternoon_activities = [
+                "Continue sightseeing at major attractions",
+                "Explore different areas of the city",
+                "Visit popular local gathering spots",
+            ]
+        
+        return DayPlan(
+            2, "MAJOR ATTRACTIONS & LANDMARKS",
+            Slot("morning", "KEY SIGHTSEEING", morning_activities),
+            Slot("lunch", "AUTHENTIC CUISINE", [
+                "Traditional restaurant serving local specialties",
+                f"Try regional dishes unique to {destination}",
+                "Experience local dining atmosphere",
+            ]),
+            Slot("afternoon", "CONTINUED EXPLORATION", afternoon_activities),
+            Slot("evening", "LOCAL EXPERIENCES", [
+                "Dinner featuring regional culinary specialties",
+                "Evening entertainment or cultural performances",
+                "Night markets or illuminated landmarks",
+            ]),
+        )
+    
+    if day == 3:
+        # Day 3: Specialized experiences based on preferences
+        if has_food:
+            specialized_morning = [
+                "Food market tour or culinary district exploration",
+                "Cooking class or food tasting experience",
+                "Visit local producers or specialty food shops",
+            ]
+            specialized_afternoon = [
+                "Continue food exploration in different neighborhoods",
+                "Street food tasting tour",
+                "Visit famous local eateries or food institutions",
+            ]
+        elif has_shopping:
+            specialized_morning = [
+                f"Explore main shopping districts in {destination}",
+                "Visit local markets for crafts and souvenirs",
+                "Boutique and specialty store exploration",
+            ]
+            specialized_afternoon = [
+                "Continue shopping in different areas",
+                "Visit shopping malls or commercial centers",
+                "Local craft and artisan workshops",
+            ]
+        elif has_relaxation:
+            specialized_morning = [
+                "Visit parks, gardens, or peaceful areas",
+                "Relaxation activities or spa experiences",
+                "Scenic and tranquil location exploration",
+            ]
+            specialized_afternoon = [
+                "Continue relaxation and leisure activities",
+                "Visit beaches, lakes, or natural retreats",
+                "Wellness and rejuvenation experiences",
+            ]
+        else:  # Mixed experiences
+            specialized_morning = [
+                f"Explore different neighborhoods of {destination}",
+                "Visit local markets and community areas",
+                "Discover hidden gems off the main tourist trail",
+            ]
+            specialized_afternoon = [
+                "Personalized activities based on your interests",
+                "Return to favorite spots for deeper exploration",
+                "Local experiences and interactions",
+            ]
+        
+        return DayPlan(
+            3, "SPECIALIZED EXPERIENCES",
+            Slot("morning", "FOCUSED EXPLORATION", specialized_morning),
+            Slot("lunch", "CULINARY ADVENTURE", [
+                "Try new local dishes or street food specialties",
+                "Visit food markets or local eateries",
+                "Experience diverse local cuisine",
+            ]),
+            Slot("afternoon", "CONTINUED SPECIALIZATION", specialized_afternoon),
+            Slot("evening", "UNIQUE EXPERIENCES", [
+                "Special dinner at unique or highly-rated restaurant",
+                "Evening activities matching your interests",
+                "Local nightlife or cultural events",
+            ]),
+        )
+    
+    # Additional days - more specialized or relaxed
+    if day == days:  # Last day
+        return DayPlan(
+            day, "FINAL EXPLORATIONS & DEPARTURE PREPARATION",
+            Slot("morning", "LAST OPPORTUNITIES", [
+                "Visit any remaining must-see attractions",
+                "Return to favorite spots for final experiences",
+                "Last-minute souvenir shopping",
+            ]),
+            Slot("lunch", "FAREWELL MEAL", [
+                "Enjoy final local cuisine experiences",
+                "Visit highly recommended restaurants missed earlier",
+                "Try dishes you haven't experienced yet",
+            ]),
+            Slot("afternoon", "RELAXED FINALE", [
+                "Leisurely activities and final explorations",
+                "Visit parks, gardens, or relaxing spots",
+                "Preparation for departure",
+            ]),
+            Slot("evening", "DEPARTURE", [
+                "Special farewell dinner",
+                "Final evening stroll and photography",
+                "Travel to airport or departure point",
+            ]),
+        )
     
-    return itinerary
+    # Middle days
+    return DayPlan(
+        day, "DEEPER EXPLORATION",
+        Slot("morning", "EXPANDED HORIZONS", [
+            f"Explore less-visited areas of {destination}",
+            "Visit specialized museums or attractions",
+            "Local neighborhood immersion",
+        ]),
+        Slot("lunch", "CONTINUED CULINARY JOURNEY", [
+            "Try different types of local cuisine",
+            "Explore food from various regions or cultures",
+            "Restaurant hopping or food court exploration",
+        ]),
+        Slot("afternoon", "ENRICHING EXPERIENCES", [
+            "Cultural workshops or local activities",
+            "Guided tours or specialized experiences",
+            "Personal interest exploration",
+        ]),
+        Slot("evening", "EVENING DELIGHTS", [
+            "Dinner at different types of establishments",
+            "Evening entertainment or shows",
+            "Local social experiences",
+        ]),
+    )
 
 def get_preference_specific_tips(preferences):
     """Generate tips based on specific travel preferences"""
@@ -0,0 +1,130 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+# Fingerprinted assets never change under the same URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# The homepage must be revalidated so new asset names are picked up after a deploy
+HTML_CACHE_CONTROL = "no-cache"
+
+ENCODING_ETAG_SUFFIXES = {"gzip": "-gz", "br": "-br"}
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+class Asset:
+    """A file held in memory together with its precompressed variants"""
+
+    __slots__ = ("content_type", "digest", "encodings")
+
+    def __init__(self, body, content_type):
+        self.content_type = content_type
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.encodings = {"identity": body}
+        if content_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.encodings["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.encodings["br"] = compressed
+
+    def etag(self, encoding="identity"):
+        """Strong ETag for one encoded variant; each variant has its own bytes"""
+        suffix = ENCODING_ETAG_SUFFIXES.get(encoding, "")
+        return f'"{self.digest}{suffix}"'
+
+    def not_modified(self, if_none_match, encoding):
+        """Whether an If-None-Match header matches the variant being served"""
+        if not if_none_match:
+            return False
+        etag = self.etag(encoding)
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            # If-None-Match uses weak comparison, so W/ prefixes are ignored
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate == "*" or candidate == etag:
+                return True
+        return False
+
+    def negotiate(self, accept_encoding):
+        """Pick the variant with the highest q-value, the smallest one on a tie"""
+        weights = parse_accept_encoding(accept_encoding)
+        wildcard = weights.get("*", 0.0)
+        # Identity is always acceptable; unless listed it ranks below any listed coding
+        best = "identity"
+        best_rank = (weights.get("identity", 0.001), -len(self.encodings["identity"]))
+        for encoding in ("gzip", "br"):
+            if encoding not in self.encodings:
+                continue
+            q = weights.get(encoding, wildcard)
+            rank = (q, -len(self.encodings[encoding]))
+            if q > 0 and rank > best_rank:
+                best, best_rank = encoding, rank
+        return best, self.encodings[best]
+
+
+def parse_accept_encoding(header):
+    """Map each content coding in an Accept-Encoding header to its q-value"""
+    weights = {}
+    for part in (header or "").lower().split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        weights[coding] = min(max(q, 0.0), 1.0)
+    return weights
+
+
+class AssetPipeline:
+    """
+    Built once at startup: fingerprints every file in `static_dir` with a
+    content hash, precompresses it, and pre-renders the homepage template with
+    the hashed asset URLs
+    """
+
+    def __init__(self, static_dir, url_prefix="/assets"):
+        self.url_prefix = url_prefix
+        self.assets = {}
+        self.manifest = {}
+
+        for root, _, files in os.walk(static_dir):
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, static_dir).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    body = f.read()
+                content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                if content_type.startswith("text/") or content_type == "application/javascript":
+                    content_type += "; charset=utf-8"
+                asset = Asset(body, content_type)
+                # The content hash is both the file name fingerprint and the ETag
+                stem, ext = os.path.splitext(name)
+                hashed_name = f"{stem}.{asset.digest}{ext}"
+                self.assets[hashed_name] = asset
+                self.manifest[name] = hashed_name
+
+    def asset_url(self, name):
+        """URL of the fingerprinted copy of a file in the static folder"""
+        return f"{self.url_prefix}/{self.manifest[name]}"
+
+    def render_page(self, templates, template_name, **context):
+        """Render a template that does not vary per request into an in-memory asset"""
+        html = templates.get_template(template_name).render(asset_url=self.asset_url, **context)
+        return Asset(html.encode("utf-8"), "text/html; charset=utf-8")
@@ -0,0 +1,294 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# A shared cache is only worth it if it is fast: slow operations count as misses
+CACHE_TIMEOUT_SECONDS = float(os.getenv("CACHE_TIMEOUT_SECONDS", 0.1))
+# After a shared-cache failure, serve from the in-process tier only for this long
+CACHE_COOLDOWN_SECONDS = float(os.getenv("CACHE_COOLDOWN_SECONDS", 30))
+
+
+class CircuitBreaker:
+    """Marks a backend as down for a cooldown window after a failure"""
+
+    def __init__(self, cooldown=CACHE_COOLDOWN_SECONDS):
+        self.cooldown = cooldown
+        self.down_until = 0.0
+
+    def available(self):
+        return time.monotonic() >= self.down_until
+
+    def failure(self):
+        self.down_until = time.monotonic() + self.cooldown
+
+
+class SQLiteBackend:
+    """
+    Shared cache in a single SQLite file using WAL mode, so every worker
+    process on the same host reads and writes the same entries. Expired rows
+    are purged at startup and every `purge_every` writes.
+    """
+
+    def __init__(self, path, timeout=CACHE_TIMEOUT_SECONDS, purge_every=500):
+        self.path = path
+        self.timeout = timeout
+        self.purge_every = purge_every
+        self.breaker = CircuitBreaker()
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+        self.purge()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _connection(self, timeout=None):
+        conn = self._connect()
+        # Waiting on a locked database is the only way SQLite can stall
+        conn.execute(f"PRAGMA busy_timeout = {int((timeout or self.timeout) * 1000)}")
+        return conn
+
+    def get(self, key, timeout=None):
+        row = self._connection(timeout).execute(
+            "SELECT value FROM cache WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl, timeout=None):
+        conn = self._connection(timeout)
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl),
+        )
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % self.purge_every == 0
+        if due:
+            self.purge(conn)
+
+    def purge(self, conn=None):
+        """Delete expired rows so the file doesn't grow without bound"""
+        (conn or self._connect()).execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+
+    def delete(self, key, timeout=None):
+        self._connection(timeout).execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+class RedisBackend:
+    """
+    Shared cache over the Redis protocol (RESP). Only GET, SET EX and DEL are
+    used, so any Redis-compatible server works, including a local stand-in.
+    """
+
+    def __init__(self, url, timeout=CACHE_TIMEOUT_SECONDS):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+        self._local = threading.local()
+
+    def _connect(self, timeout):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=timeout)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.password:
+                self._command("AUTH", self.password, timeout=timeout)
+            if self.db:
+                self._command("SELECT", str(self.db), timeout=timeout)
+        return conn
+
+    def _command(self, *args, timeout=None):
+        timeout = timeout or self.timeout
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg.encode() if isinstance(arg, str) else arg
+            payload.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        try:
+            sock, reader = self._connect(timeout)
+            sock.settimeout(timeout)
+            sock.sendall(b"".join(payload))
+            return self._read_reply(reader)
+        except (OSError, ConnectionError):
+            # Drop the broken connection (a timed-out reply may still arrive on it)
+            self.close()
+            raise
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn[1].close()
+                conn[0].close()
+            except OSError:
+                pass
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by cache server")
+        prefix, rest = line[:1], line[1:-2]
+        if prefix == b"+":
+            return rest.decode()
+        if prefix == b"-":
+            raise RuntimeError(rest.decode())
+        if prefix == b":":
+            return int(rest)
+        if prefix == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)[:-2]
+            return data.decode()
+        if prefix == b"*":
+            return [self._read_reply(reader) for _ in range(int(rest))]
+        raise RuntimeError(f"Unexpected reply from cache server: {line!r}")
+
+    def get(self, key, timeout=None):
+        return self._command("GET", key, timeout=timeout)
+
+    def set(self, key, value, ttl, timeout=None):
+        self._command("SET", key, value, "EX", str(max(1, int(ttl))), timeout=timeout)
+
+    def delete(self, key, timeout=None):
+        self._command("DEL", key, timeout=timeout)
+
+
+def create_backend():
+    """
+    Pick the shared backend from CACHE_BACKEND: "memory" (default, no shared
+    tier), "sqlite" or "redis"
+    """
+    kind = os.getenv("CACHE_BACKEND", "memory").lower()
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv("CACHE_SQLITE_PATH", "cache.sqlite3"))
+    if kind == "redis":
+        return RedisBackend(os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    return None
+
+
+class TieredCache:
+    """
+    In-process TTL/LRU cache (L1) in front of an optional shared backend (L2).
+    Values must be JSON serializable. Errors and timeouts from the shared tier
+    are treated as misses and take it out of use for a cooldown window, so a
+    slow or broken cache never holds up a request. Pass the request's deadline
+    to keep shared-tier I/O inside it.
+    """
+
+    def __init__(self, namespace, maxsize, ttl, backend=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.backend = backend
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = threading.Lock()
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+
+    def _key(self, key):
+        if not isinstance(key, str):
+            key = json.dumps(key, ensure_ascii=False, separators=(",", ":"))
+        return f"{self.namespace}:{key}"
+
+    def _backend_timeout(self, deadline=None):
+        """Timeout for one shared-tier operation, or None to skip the shared tier"""
+        if self.backend is None or not self.backend.breaker.available():
+            return None
+        timeout = self.backend.timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline.remaining())
+        return timeout if timeout > 0 else None
+
+    def _backend_failed(self, action, error):
+        print(f"Shared cache {action} failed for {self.namespace}, using in-process cache only: {error}")
+        self.backend.breaker.failure()
+
+    def get(self, key, default=None, deadline=None):
+        key = self._key(key)
+        with self.lock:
+            if key in self.local:
+                self.stats["l1_hits"] += 1
+                return self.local[key]
+
+        timeout = self._backend_timeout(deadline)
+        if timeout is not None:
+            value = None
+            try:
+                raw = self.backend.get(key, timeout=timeout)
+            except Exception as e:
+                self._backend_failed("read", e)
+                raw = None
+            if raw is not None:
+                try:
+                    value = json.loads(raw)
+                except ValueError as e:
+                    # A corrupt or foreign entry is a miss; drop it so it is rewritten
+                    print(f"Discarding unreadable shared cache entry {key}: {e}")
+                    self._discard(key, timeout)
+            if value is not None:
+                with self.lock:
+                    self.local[key] = value
+                    self.stats["l2_hits"] += 1
+                return value
+
+        with self.lock:
+            self.stats["misses"] += 1
+        return default
+
+    def _discard(self, key, timeout):
+        try:
+            self.backend.delete(key, timeout=timeout)
+        except Exception as e:
+            self._backend_failed("delete", e)
+
+    def set(self, key, value, deadline=None):
+        key = self._key(key)
+        with self.lock:
+            self.local[key] = value
+        timeout = self._backend_timeout(deadline)
+        if timeout is not None:
+            try:
+                self.backend.set(key, json.dumps(value, ensure_ascii=False), self.ttl, timeout=timeout)
+            except Exception as e:
+                self._backend_failed("write", e)
+
+    def delete(self, key, deadline=None):
+        key = self._key(key)
+        with self.lock:
+            self.local.pop(key, None)
+        timeout = self._backend_timeout(deadline)
+        if timeout is not None:
+            self._discard(key, timeout)
+
+
+# One shared backend per process, used by every cache below
+shared_backend = create_backend()
+
+forecast_cache = TieredCache("forecast", maxsize=256, ttl=10 * 60, backend=shared_backend)
+itinerary_day_cache = TieredCache("itinerary_day", maxsize=1024, ttl=6 * 60 * 60, backend=shared_backend)
+trip_notes_cache = TieredCache("trip_notes", maxsize=256, ttl=6 * 60 * 60, backend=shared_backend)
+model_cache = TieredCache("model", maxsize=4, ttl=60 * 60, backend=shared_backend)
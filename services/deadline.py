@@ -0,0 +1,90 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Overall latency budget for a request, overridable per request by header
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", 25))
+MAX_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", 60))
+
+# Time kept back at the end of every request to build the fallback itinerary
+FALLBACK_RESERVE_SECONDS = float(os.getenv("FALLBACK_RESERVE_SECONDS", 1))
+
+
+class Deadline:
+    """A point in time by which the whole request has to be answered"""
+
+    __slots__ = ("budget", "expires_at")
+
+    def __init__(self, seconds):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_header(cls, value=None):
+        """Build a deadline from an X-Request-Timeout header (seconds) or the configured default"""
+        seconds = DEFAULT_DEADLINE_SECONDS
+        if value:
+            try:
+                requested = float(value)
+            except ValueError:
+                requested = math.nan
+            if math.isfinite(requested):
+                seconds = requested
+            else:
+                print(f"Ignoring invalid request timeout header: {value!r}")
+        return cls(min(max(seconds, 1), MAX_DEADLINE_SECONDS))
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def share(self, fraction, cap=None, reserve=FALLBACK_RESERVE_SECONDS):
+        """
+        Time a stage may spend: a fraction of the full budget, never more than
+        what is left after keeping `reserve` seconds for the fallback
+        """
+        seconds = min(self.budget * fraction, self.remaining() - reserve)
+        if cap is not None:
+            seconds = min(seconds, cap)
+        return max(0.0, seconds)
+
+
+class LatencyTracker:
+    """Keeps the most recent latencies per stage and reports percentiles"""
+
+    def __init__(self, size=1000):
+        self.size = size
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.samples.setdefault(stage, deque(maxlen=self.size)).append(seconds)
+
+    def summary(self):
+        with self.lock:
+            snapshot = {stage: sorted(values) for stage, values in self.samples.items()}
+        return {
+            stage: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1),
+            }
+            for stage, values in snapshot.items()
+            if values
+        }
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+latency = LatencyTracker()
@@ -0,0 +1,173 @@
+import json
+
+# Slot order and the heading used when a day is rendered back to markdown
+SLOT_NAMES = ("morning", "lunch", "afternoon", "evening")
+
+SLOT_HEADINGS = {
+    "morning": "🌅 **MORNING (8:00 AM - 12:00 PM):",
+    "lunch": "🍽️ **LUNCH (12:00 PM - 1:30 PM):",
+    "afternoon": "🏛️ **AFTERNOON (1:30 PM - 5:00 PM):",
+    "evening": "🌃 **EVENING (6:00 PM - 9:00 PM):",
+}
+
+
+def item_text(item):
+    """Render one slot item from the model as text, whatever shape it came in"""
+    if isinstance(item, dict):
+        name = item.get("name") or item.get("place") or item.get("title")
+        details = item.get("details") or item.get("description")
+        if name and details:
+            return f"{name} - {details}"
+        if name or details:
+            return str(name or details)
+        return ", ".join(str(value) for value in item.values())
+    return str(item)
+
+
+class Slot:
+    """One part of a day (morning, lunch, afternoon or evening)"""
+
+    __slots__ = ("name", "theme", "items")
+
+    def __init__(self, name, theme="", items=None):
+        self.name = name
+        self.theme = theme
+        self.items = list(items or [])
+
+    def to_dict(self):
+        return {"theme": self.theme, "items": list(self.items)}
+
+    @classmethod
+    def from_dict(cls, name, data):
+        """Accept a {"theme", "items"} object, a bare list of items or a single string"""
+        if isinstance(data, str):
+            return cls(name, "", [data])
+        if isinstance(data, list):
+            return cls(name, "", [item_text(item) for item in data])
+        if not isinstance(data, dict):
+            return cls(name)
+        items = data.get("items") or []
+        if isinstance(items, str):
+            items = [items]
+        return cls(name, str(data.get("theme") or ""), [item_text(item) for item in items])
+
+    def to_markdown(self):
+        heading = SLOT_HEADINGS[self.name]
+        heading += f" {self.theme}**" if self.theme else "**"
+        lines = [heading]
+        lines.extend(f"• {item}" for item in self.items)
+        return "\n".join(lines)
+
+
+class DayPlan:
+    """A single itinerary day with its four slots"""
+
+    __slots__ = ("day", "title", "morning", "lunch", "afternoon", "evening")
+
+    def __init__(self, day, title, morning=None, lunch=None, afternoon=None, evening=None):
+        self.day = day
+        self.title = title
+        self.morning = morning or Slot("morning")
+        self.lunch = lunch or Slot("lunch")
+        self.afternoon = afternoon or Slot("afternoon")
+        self.evening = evening or Slot("evening")
+
+    def slots(self):
+        return [getattr(self, name) for name in SLOT_NAMES]
+
+    def to_dict(self):
+        data = {"day": self.day, "title": self.title}
+        for slot in self.slots():
+            data[slot.name] = slot.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data, day=None):
+        """Build a day from the model's JSON output, tolerating missing fields"""
+        return cls(
+            day if day is not None else int(data.get("day", 0)),
+            str(data.get("title") or ""),
+            *[Slot.from_dict(name, data.get(name)) for name in SLOT_NAMES]
+        )
+
+    def to_markdown(self):
+        parts = [f"**DAY {self.day}: {self.title}**"]
+        parts.extend(slot.to_markdown() for slot in self.slots())
+        return "\n\n".join(parts)
+
+
+# Trip-level sections the model writes once per trip, in display order
+NOTE_SECTIONS = {
+    "must_try_foods": "🍜 **MUST-TRY LOCAL FOODS:**",
+    "transportation_tips": "🚇 **TRANSPORTATION TIPS:**",
+    "budget_estimate": "💰 **BUDGET ESTIMATE:**",
+    "local_customs": "🙏 **LOCAL CUSTOMS:**",
+}
+
+
+class TripNotes:
+    """City-specific sections shown after the days of an AI itinerary"""
+
+    __slots__ = ("sections",)
+
+    def __init__(self, sections=None):
+        self.sections = {name: list((sections or {}).get(name) or []) for name in NOTE_SECTIONS}
+
+    def is_empty(self):
+        return not any(self.sections.values())
+
+    def to_dict(self):
+        return {name: list(items) for name, items in self.sections.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            return cls()
+        sections = {}
+        for name in NOTE_SECTIONS:
+            items = data.get(name) or []
+            if isinstance(items, str):
+                items = [items]
+            sections[name] = [item_text(item) for item in items] if isinstance(items, list) else []
+        return cls(sections)
+
+    def to_markdown(self):
+        parts = []
+        for name, heading in NOTE_SECTIONS.items():
+            if self.sections[name]:
+                parts.append("\n".join([heading] + [f"• {item}" for item in self.sections[name]]))
+        return "\n\n".join(parts)
+
+
+class Itinerary:
+    """A whole trip: header text, the ordered days, trip notes and trailing tips"""
+
+    __slots__ = ("destination", "days", "header", "footer", "source", "notes")
+
+    def __init__(self, destination, days, header="", footer="", source="fallback", notes=None):
+        self.destination = destination
+        self.days = list(days)
+        self.header = header
+        self.footer = footer
+        self.source = source
+        self.notes = notes
+
+    def to_dict(self):
+        return {
+            "destination": self.destination,
+            "source": self.source,
+            "days": [day.to_dict() for day in self.days],
+            "notes": self.notes.to_dict() if self.notes else None,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    def to_markdown(self):
+        parts = [self.header.strip()] if self.header else []
+        parts.extend(day.to_markdown() for day in self.days)
+        if self.notes and not self.notes.is_empty():
+            parts.append(self.notes.to_markdown())
+        if self.footer:
+            parts.append(self.footer.strip())
+        return "\n\n".join(parts) + "\n"
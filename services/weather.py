@@ -1,17 +1,48 @@
+import json
 import requests
 import os
+import time
 from dotenv import load_dotenv
+from services.cache import forecast_cache
+
+# Share of the request deadline the forecast call may use, and its hard cap
+WEATHER_DEADLINE_SHARE = 0.3
+WEATHER_TIMEOUT_SECONDS = 10
 
 load_dotenv()
 
-def get_weather(city):
+def get_weather(city, deadline=None):
+    # Forecasts change slowly, so serve recent ones from the cache
+    cache_key = city.strip().lower()
+    cached = forecast_cache.get(cache_key, deadline=deadline)
+    if cached is not None:
+        return cached
+    
     API_KEY = os.getenv("OPENWEATHER_API_KEY")
     url = f"http://api.openweathermap.org/data/2.5/forecast?q={city}&appid={API_KEY}&units=metric"
     
+    timeout = WEATHER_TIMEOUT_SECONDS
+    if deadline is not None:
+        timeout = deadline.share(WEATHER_DEADLINE_SHARE, cap=WEATHER_TIMEOUT_SECONDS)
+        if timeout <= 0:
+            return {"error": "Weather forecast timed out", "timed_out": True}
+    
     try:
-        res = requests.get(url, timeout=10)
-        res.raise_for_status()
-        data = res.json()
+        # requests' timeout applies to the connect and to each read, not to the
+        # whole response, so the body is streamed and checked against the total
+        expires_at = time.monotonic() + timeout
+        with requests.get(url, timeout=timeout, stream=True) as res:
+            res.raise_for_status()
+            body = bytearray()
+            while True:
+                # read1 returns whatever has arrived instead of waiting for a full chunk
+                chunk = res.raw.read1(8192, decode_content=True)
+                if not chunk:
+                    break
+                body += chunk
+                if time.monotonic() > expires_at:
+                    raise requests.exceptions.Timeout(f"Forecast took longer than {timeout:.1f}s in total")
+        data = json.loads(body)
         
         if "list" not in data:
             return {"error": "City not found"}
@@ -24,7 +55,11 @@ def get_weather(city):
                 "temp": entry["main"]["temp"],
                 "condition": entry["weather"][0]["description"]
             })
+        forecast_cache.set(cache_key, forecast, deadline=deadline)
         return forecast
+    except requests.exceptions.Timeout as e:
+        print(f"Weather API Timeout after {timeout:.1f}s: {e}")
+        return {"error": "Weather forecast timed out", "timed_out": True}
     except requests.exceptions.RequestException as e:
         print(f"Weather API Error: {e}")
         return {"error": "Failed to fetch weather data"}
@@ -0,0 +1,55 @@
+"""
+Minimal in-process Redis stand-in, so the RESP client can be exercised
+without a Redis server. Used by the tests and by benchmarks/cache_hit_rate.py.
+"""
+import socketserver
+import threading
+import time
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """Tiny Redis stand-in that understands GET, SET (with EX) and DEL"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RespHandler)
+        self.data = {}
+        self.lock = threading.Lock()
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            with self.server.lock:
+                if command == b"GET":
+                    value, expires = self.server.data.get(args[1], (None, 0))
+                    if value is None or expires < time.time():
+                        reply = b"$-1\r\n"
+                    else:
+                        reply = b"$%d\r\n%s\r\n" % (len(value), value)
+                elif command == b"SET":
+                    ttl = int(args[4]) if len(args) > 4 else 3600
+                    self.server.data[args[1]] = (args[2], time.time() + ttl)
+                    reply = b"+OK\r\n"
+                elif command == b"DEL":
+                    removed = self.server.data.pop(args[1], None) is not None
+                    reply = b":%d\r\n" % removed
+                else:
+                    reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
@@ -0,0 +1,116 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.assets import IMMUTABLE_CACHE_CONTROL, Asset, brotli, parse_accept_encoding
+
+BODY = b"body { color: #333; }\n" * 200
+
+
+@pytest.fixture
+def asset():
+    return Asset(BODY, "text/css; charset=utf-8")
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, {}),
+    ("gzip, br", {"gzip": 1.0, "br": 1.0}),
+    ("gzip;q=0.5, br; q=0", {"gzip": 0.5, "br": 0.0}),
+    ("GZIP;Q=0.0", {"gzip": 0.0}),
+    ("*;q=0.3, identity;q=0", {"*": 0.3, "identity": 0.0}),
+    ("gzip;q=oops, br;q=7", {"gzip": 0.0, "br": 1.0}),
+])
+def test_parse_accept_encoding(header, expected):
+    assert parse_accept_encoding(header) == expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, "identity"),
+    ("gzip", "gzip"),
+    ("gzip;q=0", "identity"),
+    ("gzip;q=0, *", "br" if brotli else "identity"),
+    ("*", "br" if brotli else "gzip"),
+    ("br;q=0.5, gzip;q=0.9", "gzip"),
+    ("identity;q=0, gzip", "gzip"),
+])
+def test_negotiate(asset, header, expected):
+    encoding, body = asset.negotiate(header)
+    assert encoding == expected
+    assert body == asset.encodings[expected]
+
+
+def test_identity_q0_still_gets_a_body_when_nothing_else_fits(asset):
+    # Identity is the only thing every server can send, so it is the last resort
+    assert asset.negotiate("identity;q=0")[0] == "identity"
+
+
+def test_etags_differ_per_encoding(asset):
+    assert len({asset.etag(), asset.etag("gzip"), asset.etag("br")}) == 3
+
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ('"{etag}"', True),
+    ('W/"{etag}"', True),
+    ('"other", "{etag}"', True),
+    ("*", True),
+    ('"{etag}-gz"', False),
+    ('"other"', False),
+])
+def test_not_modified(asset, header, matches):
+    header = header.format(etag=asset.digest) if header else header
+    assert asset.not_modified(header, "identity") is matches
+
+
+def test_homepage_is_revalidated_per_encoding(client):
+    first = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["cache-control"] == "no-cache"
+    assert first.headers["vary"] == "Accept-Encoding"
+
+    etag = first.headers["etag"]
+    same = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert same.status_code == 304
+    assert same.content == b""
+
+    # A cached gzip copy is no good to a client that now gets identity
+    other = client.get("/", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert other.status_code == 200
+    assert "content-encoding" not in other.headers
+    assert other.headers["etag"] != etag
+    assert b"<html" in other.content.lower()
+
+
+def test_homepage_accepts_weak_etags(client):
+    etag = client.get("/", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    response = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+
+
+def test_hashed_assets_are_immutable(client):
+    url = main.assets.asset_url("style.css")
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["content-type"].startswith("text/css")
+    # The test client undoes the gzip encoding
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == main.assets.assets[url.rsplit("/", 1)[1]].encodings["identity"]
+
+
+def test_hashed_asset_url_is_linked_from_the_homepage(client):
+    html = client.get("/", headers={"Accept-Encoding": "identity"}).text
+    assert main.assets.asset_url("style.css") in html
+    assert main.assets.asset_url("script.js") in html
+
+
+def test_unknown_hashed_name_is_404(client):
+    assert client.get("/assets/style.0000000000000000.css").status_code == 404
+    assert client.get("/assets/style.css").status_code == 404
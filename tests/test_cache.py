@@ -0,0 +1,147 @@
+import io
+import socket
+import threading
+import time
+
+import pytest
+
+from services.cache import RedisBackend, SQLiteBackend, TieredCache
+from tests.resp_stand_in import RespStandIn
+
+
+@pytest.fixture
+def resp_server():
+    server = RespStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stalled_server():
+    """Accepts connections but never replies"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(16)
+    accepted = []
+
+    def accept():
+        while True:
+            try:
+                accepted.append(listener.accept()[0])
+            except OSError:
+                return
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield listener.getsockname()[1]
+    listener.close()
+    for conn in accepted:
+        conn.close()
+
+
+def redis_backend(port, **kwargs):
+    return RedisBackend(f"redis://127.0.0.1:{port}/0", **kwargs)
+
+
+def test_redis_set_get_delete(resp_server):
+    backend = redis_backend(resp_server.server_address[1])
+
+    assert backend.get("missing") is None
+    backend.set("city", '{"temp": 20}', ttl=60)
+    assert backend.get("city") == '{"temp": 20}'
+    backend.delete("city")
+    assert backend.get("city") is None
+
+
+def test_redis_round_trips_non_ascii_values(resp_server):
+    backend = redis_backend(resp_server.server_address[1])
+
+    backend.set("city", "São Paulo ☀️", ttl=60)
+
+    assert backend.get("city") == "São Paulo ☀️"
+
+
+def test_redis_error_reply_raises(resp_server):
+    backend = redis_backend(resp_server.server_address[1])
+
+    with pytest.raises(RuntimeError, match="unknown command"):
+        backend._command("PING")
+    # The connection is still usable after an error reply
+    backend.set("k", "v", ttl=60)
+    assert backend.get("k") == "v"
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (b"+OK\r\n", "OK"),
+    (b":42\r\n", 42),
+    (b"$5\r\nhello\r\n", "hello"),
+    (b"$0\r\n\r\n", ""),
+    (b"$-1\r\n", None),
+    (b"*3\r\n$1\r\na\r\n:2\r\n$-1\r\n", ["a", 2, None]),
+    (b"*0\r\n", []),
+])
+def test_read_reply(raw, expected):
+    assert RedisBackend("redis://localhost")._read_reply(io.BytesIO(raw)) == expected
+
+
+def test_read_reply_error_and_closed_connection():
+    backend = RedisBackend("redis://localhost")
+
+    with pytest.raises(RuntimeError, match="WRONGTYPE"):
+        backend._read_reply(io.BytesIO(b"-WRONGTYPE bad\r\n"))
+    with pytest.raises(ConnectionError):
+        backend._read_reply(io.BytesIO(b""))
+
+
+def test_tiered_cache_reads_through_shared_tier(resp_server):
+    port = resp_server.server_address[1]
+    writer = TieredCache("test", maxsize=8, ttl=60, backend=redis_backend(port))
+    reader = TieredCache("test", maxsize=8, ttl=60, backend=redis_backend(port))
+
+    writer.set(("rome", 3), {"days": [1, 2, 3]})
+
+    assert reader.get(("rome", 3)) == {"days": [1, 2, 3]}
+    assert reader.stats["l2_hits"] == 1
+    assert reader.get(("rome", 3)) == {"days": [1, 2, 3]}
+    assert reader.stats["l1_hits"] == 1
+
+
+def test_stalled_shared_tier_is_a_fast_miss(stalled_server):
+    cache = TieredCache("test", maxsize=8, ttl=60, backend=redis_backend(stalled_server, timeout=0.05))
+
+    started = time.monotonic()
+    assert cache.get("a") is None
+    cache.set("b", 1)
+    assert cache.get("c", default="miss") == "miss"
+
+    # Only the first operation waits; the breaker then skips the shared tier
+    assert time.monotonic() - started < 0.5
+    assert not cache.backend.breaker.available()
+    assert cache.get("b") == 1
+
+
+def test_sqlite_purges_expired_rows(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), purge_every=100)
+
+    for i in range(100):
+        backend.set(f"k{i}", "v", ttl=0.001)
+    time.sleep(0.01)
+    for i in range(100):
+        backend.set(f"fresh{i}", "v", ttl=60)
+
+    count = backend._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+    assert count == 100
+    assert backend.get("fresh0") == "v"
+
+
+def test_corrupt_shared_entry_is_a_miss(resp_server):
+    backend = redis_backend(resp_server.server_address[1])
+    cache = TieredCache("test", maxsize=8, ttl=60, backend=backend)
+    backend.set("test:rome", '{"truncated": [1, 2', ttl=60)
+
+    assert cache.get("rome", default="miss") == "miss"
+    assert cache.stats == {"l1_hits": 0, "l2_hits": 0, "misses": 1}
+    # The bad entry is removed and the shared tier stays in use
+    assert backend.get("test:rome") is None
+    assert backend.breaker.available()
@@ -0,0 +1,138 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from services import ai_itinerary
+from services.ai_itinerary import MODEL_CANDIDATES, HedgeBudget, ModelCall, call_model, run_model
+
+PRIMARY, HEDGE = MODEL_CANDIDATES[0], MODEL_CANDIDATES[1]
+
+
+def fake_models(behaviour, calls=None):
+    """run_model stand-in: behaviour maps model name -> (delay, result or exception)"""
+    def run(model_name, prompt, expires_at, generation_config=None):
+        if calls is not None:
+            calls.append(model_name)
+        delay, outcome = behaviour[model_name]
+        time.sleep(min(delay, max(0.0, expires_at - time.monotonic())))
+        if time.monotonic() >= expires_at:
+            raise TimeoutError(f"{model_name} timed out")
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return run
+
+
+@pytest.fixture
+def hedging():
+    with mock.patch.object(ai_itinerary, "HEDGE_AFTER_SECONDS", 0.1), \
+            mock.patch.object(ai_itinerary, "hedge_budget", HedgeBudget()):
+        yield
+
+
+@pytest.fixture
+def small_pool():
+    """A one-thread model pool, so calls can be made to wait in the queue"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    with mock.patch.object(ai_itinerary, "model_executor", executor):
+        yield
+    executor.shutdown(wait=True)
+
+
+def test_primary_answers(hedging):
+    calls = []
+    with mock.patch.object(ai_itinerary, "run_model", fake_models({PRIMARY: (0.01, "primary")}, calls)):
+        assert call_model(PRIMARY, "prompt", timeout=1) == "primary"
+    assert calls == [PRIMARY]
+
+
+def test_primary_fails_fast_hedge_is_sent_immediately(hedging):
+    behaviour = {PRIMARY: (0, RuntimeError("quota")), HEDGE: (0.01, "hedge")}
+    with mock.patch.object(ai_itinerary, "run_model", fake_models(behaviour)):
+        started = time.monotonic()
+        assert call_model(PRIMARY, "prompt", timeout=1) == "hedge"
+    # No waiting for HEDGE_AFTER_SECONDS once the primary has failed
+    assert time.monotonic() - started < 0.1
+
+
+def test_primary_failure_is_raised_without_hedging():
+    behaviour = {PRIMARY: (0, RuntimeError("quota"))}
+    with mock.patch.object(ai_itinerary, "HEDGE_AFTER_SECONDS", 0), \
+            mock.patch.object(ai_itinerary, "run_model", fake_models(behaviour)):
+        with pytest.raises(RuntimeError, match="quota"):
+            call_model(PRIMARY, "prompt", timeout=1)
+
+
+def test_slow_primary_hedge_wins(hedging):
+    calls = []
+    behaviour = {PRIMARY: (2, "primary"), HEDGE: (0.05, "hedge")}
+    with mock.patch.object(ai_itinerary, "run_model", fake_models(behaviour, calls)):
+        started = time.monotonic()
+        assert call_model(PRIMARY, "prompt", timeout=1) == "hedge"
+    elapsed = time.monotonic() - started
+    assert calls == [PRIMARY, HEDGE]
+    assert 0.1 <= elapsed < 0.5
+
+
+def test_both_time_out(hedging):
+    behaviour = {PRIMARY: (5, "primary"), HEDGE: (5, "hedge")}
+    with mock.patch.object(ai_itinerary, "run_model", fake_models(behaviour)):
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            call_model(PRIMARY, "prompt", timeout=0.3)
+    assert time.monotonic() - started < 0.5
+
+
+def test_run_model_skips_calls_whose_deadline_passed_in_the_queue():
+    with mock.patch.object(ai_itinerary.genai, "GenerativeModel") as model:
+        with pytest.raises(TimeoutError):
+            run_model(PRIMARY, "prompt", expires_at=time.monotonic() - 1)
+    model.assert_not_called()
+
+
+def test_run_model_timeout_counts_from_start():
+    with mock.patch.object(ai_itinerary.genai, "GenerativeModel") as model:
+        run_model(PRIMARY, "prompt", expires_at=time.monotonic() + 2)
+    timeout = model.return_value.generate_content.call_args.kwargs["request_options"]["timeout"]
+    assert 1.5 < timeout <= 2
+
+
+def test_hedge_timer_starts_when_the_primary_runs(hedging, small_pool):
+    calls = []
+    behaviour = {"blocker": (0.3, "busy"), PRIMARY: (0.05, "primary"), HEDGE: (0.01, "hedge")}
+    # Room for more calls as far as the hedge check knows; only the timer decides
+    with mock.patch.object(ai_itinerary, "MODEL_MAX_CONCURRENCY", 16), \
+            mock.patch.object(ai_itinerary, "run_model", fake_models(behaviour, calls)):
+        ModelCall("blocker", "prompt", time.monotonic() + 1)
+        assert call_model(PRIMARY, "prompt", timeout=1) == "primary"
+    # The primary waited 0.3s in the queue but ran for less than HEDGE_AFTER_SECONDS
+    assert calls == ["blocker", PRIMARY]
+
+
+def test_no_hedge_when_the_pool_is_full(hedging):
+    calls = []
+    behaviour = {PRIMARY: (0.3, "primary"), HEDGE: (0.01, "hedge")}
+    with mock.patch.object(ai_itinerary, "MODEL_MAX_CONCURRENCY", 1), \
+            mock.patch.object(ai_itinerary, "run_model", fake_models(behaviour, calls)):
+        assert call_model(PRIMARY, "prompt", timeout=1) == "primary"
+    assert calls == [PRIMARY]
+
+
+def test_no_hedge_when_the_budget_is_spent(hedging):
+    calls = []
+    behaviour = {PRIMARY: (0.3, "primary"), HEDGE: (0.01, "hedge")}
+    with mock.patch.object(ai_itinerary, "hedge_budget", HedgeBudget(ratio=0, burst=0)), \
+            mock.patch.object(ai_itinerary, "run_model", fake_models(behaviour, calls)):
+        assert call_model(PRIMARY, "prompt", timeout=1) == "primary"
+    assert calls == [PRIMARY]
+
+
+def test_hedge_budget_limits_hedges_to_a_share_of_calls():
+    budget = HedgeBudget(ratio=0.25, burst=2)
+
+    assert [budget.spend() for _ in range(3)] == [True, True, False]
+    for _ in range(4):
+        budget.earn()
+    assert [budget.spend() for _ in range(2)] == [True, False]
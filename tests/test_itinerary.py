@@ -0,0 +1,174 @@
+import json
+import re
+from unittest import mock
+
+import pytest
+
+from services import ai_itinerary
+from services.ai_itinerary import RegenerationUnavailable, generate_structured_itinerary
+from services.cache import TieredCache
+from services.itinerary_model import DayPlan, Slot, TripNotes
+
+RAINY = [{"datetime": "2025-01-01 12:00:00", "temp": 14.0, "condition": "heavy intensity rain"}] * 5
+SUNNY = [{"datetime": "2025-01-01 12:00:00", "temp": 27.0, "condition": "clear sky"}] * 5
+
+NOTES = {
+    "must_try_foods": ["Cacio e pepe at Roscioli"],
+    "transportation_tips": ["Walk the centro storico"],
+    "budget_estimate": ["€120 per day"],
+    "local_customs": ["Cover shoulders in churches"],
+}
+
+
+class FakeGemini:
+    """call_model stand-in that answers the JSON day prompt for the days it asks for"""
+
+    def __init__(self, label="v1", broken_days=(), notes=NOTES):
+        self.label = label
+        self.broken_days = broken_days
+        self.notes = notes
+        self.prompts = []
+
+    def requested(self, prompt):
+        listed = re.search(r"Write ONLY these days of the itinerary: ([\d, ]+)\.", prompt).group(1)
+        return [int(day) for day in listed.split(",")]
+
+    def __call__(self, model_name, prompt, timeout, generation_config=None):
+        self.prompts.append(prompt)
+        days = []
+        for day in self.requested(prompt):
+            if day in self.broken_days:
+                days.append({"day": "not a number", "morning": 42})
+            else:
+                days.append({"day": day, "title": f"{self.label} day {day}", "morning": [f"{self.label} place {day}"]})
+        data = {"days": days}
+        if '"notes"' in prompt:
+            data["notes"] = self.notes
+        return mock.Mock(text=json.dumps(data))
+
+
+@pytest.fixture
+def gemini():
+    """Gemini configured, with fresh in-process caches"""
+    with mock.patch.object(ai_itinerary, "genai_configured", True), \
+            mock.patch.object(ai_itinerary, "get_correct_model", return_value=ai_itinerary.MODEL_CANDIDATES[0]), \
+            mock.patch.object(ai_itinerary, "itinerary_day_cache", TieredCache("day", maxsize=64, ttl=60)), \
+            mock.patch.object(ai_itinerary, "trip_notes_cache", TieredCache("notes", maxsize=64, ttl=60)):
+        yield
+
+
+def plan(fake, days, regenerate=(), weather=RAINY):
+    with mock.patch.object(ai_itinerary, "call_model", fake):
+        return generate_structured_itinerary("Rome", days, "food", weather, regenerate=regenerate)
+
+
+def titles(itinerary):
+    return [day.title for day in itinerary.days]
+
+
+def test_extending_a_trip_only_generates_the_new_days(gemini):
+    fake = FakeGemini()
+    plan(fake, 3)
+    extended = plan(fake, 5)
+
+    # Day 3 stops being the departure day, so it is generated again
+    assert [fake.requested(prompt) for prompt in fake.prompts] == [[1, 2, 3], [3, 4, 5]]
+    assert titles(extended) == [f"v1 day {day}" for day in range(1, 6)]
+
+
+def test_regenerated_day_is_not_written_to_the_shared_cache(gemini):
+    plan(FakeGemini("v1"), 3)
+    fake = FakeGemini("v2")
+    regenerated = plan(fake, 3, regenerate=(2,))
+
+    assert fake.requested(fake.prompts[0]) == [2]
+    assert titles(regenerated) == ["v1 day 1", "v2 day 2", "v1 day 3"]
+    # The kept days are listed so the model doesn't repeat them
+    assert "Do NOT repeat" in fake.prompts[0] and "v1 place 1" in fake.prompts[0]
+
+    # Everyone else still gets the original day 2
+    assert titles(plan(FakeGemini("v3"), 3)) == ["v1 day 1", "v1 day 2", "v1 day 3"]
+
+
+def test_regenerate_without_the_model_is_refused():
+    with mock.patch.object(ai_itinerary, "genai_configured", False):
+        with pytest.raises(RegenerationUnavailable):
+            generate_structured_itinerary("Rome", 3, "food", RAINY, regenerate=(2,))
+
+
+def test_regenerate_refused_when_the_model_fails(gemini):
+    plan(FakeGemini("v1"), 3)
+    with pytest.raises(RegenerationUnavailable):
+        plan(FakeGemini("v2", broken_days=(2,)), 3, regenerate=(2,))
+
+
+def test_malformed_day_falls_back_alone(gemini):
+    fake = FakeGemini(broken_days=(2,))
+    itinerary = plan(fake, 3)
+
+    assert titles(itinerary) == ["v1 day 1", "MAJOR ATTRACTIONS & LANDMARKS", "v1 day 3"]
+    # The fallback day is not cached under the Gemini key, so it is retried
+    retry = FakeGemini("v2")
+    assert titles(plan(retry, 3))[1] == "v2 day 2"
+    assert retry.requested(retry.prompts[0]) == [2]
+
+
+def test_notes_replace_the_generic_footer_and_are_cached(gemini):
+    fake = FakeGemini()
+    itinerary = plan(fake, 3)
+
+    assert itinerary.notes.to_dict() == NOTES
+    assert itinerary.footer == ""
+    markdown = itinerary.to_markdown()
+    assert "Cacio e pepe at Roscioli" in markdown
+    assert "PRACTICAL INFORMATION" not in markdown
+
+    # A longer trip reuses the notes instead of asking for them again
+    plan(fake, 4)
+    assert '"notes"' in fake.prompts[0] and '"notes"' not in fake.prompts[1]
+
+
+def test_missing_notes_keep_the_generic_footer(gemini):
+    itinerary = plan(FakeGemini(notes={}), 3)
+
+    assert itinerary.notes is None or itinerary.notes.is_empty()
+    assert "PRACTICAL INFORMATION FOR ROME" in itinerary.to_markdown()
+
+
+def test_cached_days_follow_the_forecast(gemini):
+    plan(FakeGemini("rain"), 3, weather=RAINY)
+    fake = FakeGemini("sun")
+
+    assert titles(plan(fake, 3, weather=SUNNY)) == ["sun day 1", "sun day 2", "sun day 3"]
+    assert titles(plan(fake, 3, weather=RAINY)) == ["rain day 1", "rain day 2", "rain day 3"]
+
+
+@pytest.mark.parametrize("data, theme, items", [
+    ("Colosseum", "", ["Colosseum"]),
+    (["Colosseum", "Forum"], "", ["Colosseum", "Forum"]),
+    ([{"name": "Roscioli", "details": "carbonara"}], "", ["Roscioli - carbonara"]),
+    ({"theme": "Ancient Rome", "items": "Palatine Hill"}, "Ancient Rome", ["Palatine Hill"]),
+    ({"theme": None, "items": [{"place": "Trastevere"}]}, "", ["Trastevere"]),
+    (None, "", []),
+    (42, "", []),
+])
+def test_slot_from_odd_model_output(data, theme, items):
+    slot = Slot.from_dict("morning", data)
+    assert (slot.theme, slot.items) == (theme, items)
+
+
+def test_day_from_odd_model_output():
+    day = DayPlan.from_dict({"title": 7, "lunch": "Pizza", "evening": {"items": [{"foo": "bar"}]}}, day=2)
+
+    assert (day.day, day.title) == (2, "7")
+    assert day.morning.items == [] and day.lunch.items == ["Pizza"]
+    assert day.evening.items == ["bar"]
+    assert "**DAY 2: 7**" in day.to_markdown()
+
+
+def test_trip_notes_from_odd_model_output():
+    notes = TripNotes.from_dict({"must_try_foods": "Gelato", "local_customs": {"not": "a list"}, "extra": ["x"]})
+
+    assert notes.to_dict()["must_try_foods"] == ["Gelato"]
+    assert notes.to_dict()["local_customs"] == []
+    assert TripNotes.from_dict("nonsense").is_empty()